@@ -0,0 +1,65 @@
+"""
+Authentication fast path: ``request.user`` is read from the cache instead of
+the database on every request.
+
+The authenticated user (and with it ``is_approved``, which
+``approved_required`` checks) is cached under its primary key for
+``AUTH_USER_CACHE_TTL`` seconds and shared by all sessions of that user.
+The session's backend and hash are still checked against the cached object;
+anything that does not match exactly (a backend no longer configured, a
+hash made with one of ``SECRET_KEY_FALLBACKS``, changed credentials) is
+handed to ``django.contrib.auth.get_user``, so logging out, rotating the
+secret key or changing credentials behave as with Django's own middleware. Entries
+are dropped by the CustomUser signal handlers, e.g. when manage_view
+approves or unapproves someone.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+
+def user_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate(user_id):
+    cache.delete(user_key(user_id))
+
+
+def get_user(request):
+    """
+    Same contract as ``django.contrib.auth.get_user``, answered from the cache when possible.
+    """
+    try:
+        user_id = get_user_model()._meta.pk.to_python(request.session[SESSION_KEY])
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+
+    user = cache.get(user_key(user_id))
+    if user is not None and backend_path in settings.AUTHENTICATION_BACKENDS:
+        session_hash = request.session.get(HASH_SESSION_KEY)
+        if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+            user.backend = backend_path
+            return user
+
+    # Django verifies the fallback keys (upgrading the session hash) and
+    # flushes the session when it is no longer valid
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        cache.set(user_key(user.pk), user, getattr(settings, 'AUTH_USER_CACHE_TTL', 300))
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """
+    Drop-in replacement for AuthenticationMiddleware using the cached user.
+    """
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_user(request))
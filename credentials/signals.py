@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from credentials import middleware
+from credentials.models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, **kwargs):
+    # approval changes in manage_view, profile updates on login, admin edits
+    middleware.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    middleware.invalidate(instance.pk)
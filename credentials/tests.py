@@ -1,3 +1,58 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.auth import HASH_SESSION_KEY
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from credentials.models import CustomUser
+
+
+class CachedAuthenticationTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.manager = CustomUser.objects.create(username="Manager", is_approved=True)
+		self.member = CustomUser.objects.create(username="Member", is_approved=True)
+		self.url = reverse('enrollment_keys_api')
+
+	def test_user_and_session_come_from_the_cache(self):
+		self.client.force_login(self.member)
+		self.client.get(self.url)
+		with CaptureQueriesContext(connection) as queries:
+			resp = self.client.get(self.url)
+		self.assertEqual(resp.status_code, 200)
+		tables = ' '.join(query['sql'] for query in queries)
+		self.assertNotIn('credentials_customuser', tables)
+		self.assertNotIn('django_session', tables)
+
+	def test_unapproval_takes_effect_immediately(self):
+		self.client.force_login(self.member)
+		self.assertEqual(self.client.get(self.url).status_code, 200)
+
+		manager = self.client_class()
+		manager.force_login(self.manager)
+		manager.post(reverse('manage_view'), {'action': 'unapprove', 'username': "Member"})
+
+		resp = self.client.get(self.url)
+		self.assertTemplateUsed(resp, 'home.html')
+
+	def test_logout_is_honoured(self):
+		self.client.force_login(self.member)
+		self.client.get(self.url)
+		self.client.logout()
+		self.assertEqual(self.client.get(self.url).status_code, 302)
+
+	def test_removed_backend_is_not_trusted(self):
+		self.client.force_login(self.member, backend='django.contrib.auth.backends.ModelBackend')
+		self.assertEqual(self.client.get(self.url).status_code, 200)
+		with override_settings(AUTHENTICATION_BACKENDS=['social_core.backends.mediawiki.MediaWiki']):
+			self.assertEqual(self.client.get(self.url).status_code, 302)
+
+	def test_secret_key_rotation_keeps_sessions(self):
+		self.client.force_login(self.member)
+		self.assertEqual(self.client.get(self.url).status_code, 200)
+		with override_settings(SECRET_KEY='rotated-' + settings.SECRET_KEY, SECRET_KEY_FALLBACKS=[settings.SECRET_KEY]):
+			self.assertEqual(self.client.get(self.url).status_code, 200)
+			# the session now carries a hash made with the new key
+			self.assertEqual(self.client.session[HASH_SESSION_KEY], self.member.get_session_auth_hash())
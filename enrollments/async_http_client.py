@@ -0,0 +1,168 @@
+"""
+Async counterpart of ``enrollments.http_client`` for the async proxy views.
+
+Two backends, chosen by ``OUTBOUND_HTTP['ASYNC_BACKEND']``:
+
+``httpx`` (set by letsconn/asgi.py; needs the httpx package)
+    Every event loop gets one pooled ``httpx.AsyncClient`` per upstream host,
+    with the same timeouts, retry budget and circuit breaker as the sync
+    client, and at most ``MAX_CONCURRENCY`` requests in flight. Under ASGI
+    that is one loop per process, so a single worker can wait on hundreds of
+    upstream calls at once.
+
+``threads`` (the default)
+    Calls go to the sync pooled client on a worker thread. Under WSGI every
+    async view runs on a short-lived loop of its own, where a connection pool
+    per loop would never be reused.
+"""
+import asyncio
+import logging
+import weakref
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+
+from enrollments import http_client
+from enrollments.http_client import CircuitBreaker, UpstreamUnavailable
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+logger = logging.getLogger(__name__)
+
+_warned_missing_httpx = False
+
+
+def backend():
+    global _warned_missing_httpx
+    if http_client.get_config()['ASYNC_BACKEND'] == 'httpx':
+        if httpx is not None:
+            return 'httpx'
+        if not _warned_missing_httpx:
+            _warned_missing_httpx = True
+            logger.warning("OUTBOUND_HTTP ASYNC_BACKEND is httpx but httpx is not installed; using threads")
+    return 'threads'
+
+
+class AsyncOutboundClient:
+    """
+    Holds one httpx.AsyncClient and one circuit breaker per upstream host,
+    for use on a single event loop.
+    """
+    def __init__(self, config=None):
+        self.config = config or http_client.get_config()
+        self._clients = {}
+        self._breakers = {}
+        self._semaphore = asyncio.Semaphore(self.config['MAX_CONCURRENCY'])
+
+    def _build_client(self):
+        config = self.config
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config['READ_TIMEOUT'], connect=config['CONNECT_TIMEOUT']),
+            # connections are cheap on the event loop; only the idle ones are capped like the sync pool
+            limits=httpx.Limits(
+                max_connections=config['MAX_CONCURRENCY'],
+                max_keepalive_connections=config['POOL_MAXSIZE'],
+            ),
+            headers={'User-Agent': config['USER_AGENT']},
+            follow_redirects=True,
+        )
+
+    def _for_host(self, host):
+        if host not in self._clients:
+            self._clients[host] = self._build_client()
+            self._breakers[host] = CircuitBreaker(
+                self.config['BREAKER_THRESHOLD'], self.config['BREAKER_COOLDOWN']
+            )
+        return self._clients[host], self._breakers[host]
+
+    async def _send(self, client, method, url, **kwargs):
+        """
+        Send with the retry budget of the sync client: connection errors,
+        timeouts and RETRY_STATUSES are retried with exponential backoff.
+        """
+        config = self.config
+        retries = config['MAX_RETRIES'] if method in config['RETRY_METHODS'] else 0
+        host = urlsplit(url).netloc
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(config['BACKOFF_FACTOR'] * 2 ** (attempt - 1))
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TimeoutException as e:
+                error = UpstreamUnavailable(f"Timed out talking to {host}: {e}", status_code=504)
+                continue
+            except httpx.HTTPError as e:
+                error = UpstreamUnavailable(f"Could not reach {host}: {e}")
+                continue
+            if response.status_code in config['RETRY_STATUSES'] and attempt < retries:
+                continue
+            return response
+        raise error
+
+    async def request(self, method, url, **kwargs):
+        host = urlsplit(url).netloc
+        client, breaker = self._for_host(host)
+        if not breaker.allow():
+            raise UpstreamUnavailable(f"Circuit open for {host}", status_code=503)
+
+        async with self._semaphore:
+            try:
+                response = await self._send(client, method, url, **kwargs)
+            except UpstreamUnavailable:
+                breaker.record_failure()
+                raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def breaker_states(self):
+        return {host: breaker.state for host, breaker in self._breakers.items()}
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """
+    Return the client of the running event loop, creating it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncOutboundClient()
+    return client
+
+
+def reset_client():
+    """
+    Forget every loop's client (used by tests and after settings changes).
+    """
+    _clients.clear()
+
+
+async def request(method, url, **kwargs):
+    if backend() == 'httpx':
+        return await get_client().request(method, url, **kwargs)
+    # looked up on every call, so the sync client can be swapped or patched
+    func = getattr(http_client, method.lower())
+    return await sync_to_async(func, thread_sensitive=False)(url, **kwargs)
+
+
+async def get(url, **kwargs):
+    return await request('GET', url, **kwargs)
+
+
+async def post(url, **kwargs):
+    return await request('POST', url, **kwargs)
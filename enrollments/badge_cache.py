@@ -0,0 +1,145 @@
+"""
+Cached payloads of the public badge API.
+
+``user_badges(username)`` returns the /user-badges/ payload of one user
+together with a strong ETag, storing it in the default cache for
+``USER_BADGES_CACHE_TTL`` seconds. Entries are dropped explicitly by the
+signal handlers whenever an award of that user, or a badge the user holds,
+is created, changed or deleted, so the TTL only bounds memory use. There
+is no Last-Modified: revoking an older award leaves every remaining
+timestamp unchanged, so only the content ETag reliably changes.
+``user_badges_many`` serves the batch endpoint from the same entries.
+Entries are keyed by ``username_key``, so that on MySQL, whose collation
+compares usernames case-insensitively, ``foo`` and ``Foo`` share the entry
+that an award to either of them invalidates.
+
+``certificate(verification_code, render)`` does the same for the rendered
+HTML of the public certificate page. Unknown codes are remembered for
+``BADGE_CERTIFICATE_MISSING_TTL`` seconds so probing random codes does not
+reach the database.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from enrollments.list_cache import content_etag
+from enrollments.models import UserBadge
+
+
+def case_insensitive_usernames():
+    """
+    Whether the database compares usernames case-insensitively (the ToolsDB
+    MySQL collation does, SQLite does not).
+    """
+    return connection.vendor == 'mysql'
+
+
+def username_key(username):
+    """
+    ``username`` as the database compares it.
+    """
+    return username.casefold() if case_insensitive_usernames() else username
+
+
+def user_badges_key(username):
+    return 'user-badges:' + hashlib.sha1(username_key(username).encode()).hexdigest()
+
+
+def build_user_badges(userbadges):
+    """
+    Cache entry for an iterable of UserBadge rows (with their badge selected).
+    """
+    data = []
+    for ub in userbadges:
+        data.append({
+            'name': ub.badge.name,
+            'picture': ub.badge.image,
+            'description': ub.badge.description,
+            'timestamp': ub.issued_at.isoformat(),
+            'verification_code': ub.verification_code,
+        })
+    return {'data': data, 'etag': content_etag(data)}
+
+
+def user_badges(username):
+    """
+    ``{data, etag}`` for the badges of ``username``, newest first.
+    """
+    key = user_badges_key(username)
+    entry = cache.get(key)
+    if entry is None:
+        entry = build_user_badges(
+            UserBadge.objects.filter(user=username).select_related('badge').order_by('-issued_at')
+        )
+        cache.set(key, entry, getattr(settings, 'USER_BADGES_CACHE_TTL', 3600))
+    return entry
+
+
+def user_badges_many(usernames):
+    """
+    ``{username: entry}`` for many users: one cache round trip, then a single
+    ``user__in`` query for the users that were not cached. Every returned row
+    goes to each requested name it matches under the database's comparison.
+    """
+    keys = {}
+    for username in usernames:
+        keys.setdefault(user_badges_key(username), []).append(username)
+    cached = cache.get_many(list(keys))
+    entries = {username: entry for key, entry in cached.items() for username in keys[key]}
+
+    misses = [username for names in keys.values() for username in names if username not in entries]
+    if misses:
+        awards = {username: [] for username in misses}
+        requested = {}
+        for username in misses:
+            requested.setdefault(username_key(username), []).append(username)
+        rows = UserBadge.objects.filter(user__in=misses).select_related('badge').order_by('-issued_at')
+        for ub in rows:
+            # rows a casefold does not map back (accent-insensitive matches) are skipped
+            for username in requested.get(username_key(ub.user), []):
+                awards[username].append(ub)
+        built = {username: build_user_badges(userbadges) for username, userbadges in awards.items()}
+        cache.set_many(
+            {user_badges_key(username): entry for username, entry in built.items()},
+            getattr(settings, 'USER_BADGES_CACHE_TTL', 3600),
+        )
+        entries.update(built)
+    return entries
+
+
+def invalidate_users(usernames):
+    cache.delete_many([user_badges_key(username) for username in set(usernames)])
+
+
+def certificate_key(verification_code):
+    return 'badge-certificate:' + hashlib.sha1(verification_code.encode()).hexdigest()
+
+
+def certificate(verification_code, render):
+    """
+    ``{html, etag, last_modified}`` of the certificate page of an award, or
+    None if no award has that code. ``render(userbadge)`` builds the HTML on a miss.
+    """
+    key = certificate_key(verification_code)
+    entry = cache.get(key)
+    if entry is False:
+        return None
+    if entry is None:
+        userbadge = UserBadge.objects.select_related('badge').filter(verification_code=verification_code).first()
+        if userbadge is None:
+            cache.set(key, False, getattr(settings, 'BADGE_CERTIFICATE_MISSING_TTL', 300))
+            return None
+        html = render(userbadge)
+        entry = {
+            'html': html,
+            'etag': '"%s"' % hashlib.sha1(html.encode()).hexdigest(),
+            'last_modified': int(max(userbadge.issued_at, userbadge.badge.updated_at).timestamp()),
+        }
+        cache.set(key, entry, getattr(settings, 'BADGE_CERTIFICATE_CACHE_TTL', 86400))
+    return entry
+
+
+def invalidate_certificates(verification_codes):
+    cache.delete_many([certificate_key(code) for code in set(verification_codes)])
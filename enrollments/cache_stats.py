@@ -0,0 +1,105 @@
+"""
+Figures about the configured cache backends for the cache-stats admin page.
+
+Every backend reports its configuration and the round-trip time of a probe
+key; locmem, file, db and redis backends also report their size and, for
+redis, the server's hit and miss counters.
+"""
+import os
+import time
+import uuid
+from urllib.parse import urlsplit, urlunsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+
+def _safe_location(location):
+    """
+    LOCATION with the password of any URL (e.g. REDIS_URL) masked; redis
+    accepts a list of URLs.
+    """
+    if isinstance(location, (list, tuple)):
+        return ', '.join(_safe_location(item) for item in location)
+    parts = urlsplit(str(location))
+    if parts.password is None:
+        return str(location)
+    userinfo = f'{parts.username}:***' if parts.username else '***'
+    host = parts.netloc.rpartition('@')[2]
+    return urlunsplit(parts._replace(netloc=f'{userinfo}@{host}'))
+
+
+def _probe(cache):
+    """
+    Milliseconds for one set, get and delete of a throwaway key.
+    """
+    key = f'cache-stats-probe:{uuid.uuid4().hex}'
+    started = time.perf_counter()
+    cache.set(key, 1, 10)
+    hit = cache.get(key) == 1
+    cache.delete(key)
+    return (time.perf_counter() - started) * 1000, hit
+
+
+def _backend_figures(cache, backend):
+    if backend.endswith('LocMemCache'):
+        return [('Entries', len(cache._cache)), ('Max entries', cache._max_entries)]
+
+    if backend.endswith('FileBasedCache'):
+        files = [os.path.join(cache._dir, name) for name in os.listdir(cache._dir)] if os.path.isdir(cache._dir) else []
+        return [
+            ('Entries', len(files)),
+            ('Size on disk (bytes)', sum(os.path.getsize(path) for path in files)),
+            ('Max entries', cache._max_entries),
+        ]
+
+    if backend.endswith('DatabaseCache'):
+        table = connection.ops.quote_name(cache._table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            entries = cursor.fetchone()[0]
+        return [('Entries', entries), ('Max entries', cache._max_entries)]
+
+    if backend.endswith('RedisCache'):
+        info = cache._cache.get_client(None).info()
+        hits, misses = info.get('keyspace_hits', 0), info.get('keyspace_misses', 0)
+        return [
+            ('Keys in database', cache._cache.get_client(None).dbsize()),
+            ('Memory used', info.get('used_memory_human')),
+            ('Hits', hits),
+            ('Misses', misses),
+            ('Hit ratio', f'{hits / (hits + misses):.1%}' if hits + misses else '-'),
+        ]
+
+    return []
+
+
+def collect():
+    """
+    One dict per configured cache alias: name, backend, location, figures
+    (a list of (label, value)) and an error message if the backend failed.
+    """
+    stats = []
+    for alias, config in settings.CACHES.items():
+        cache = caches[alias]
+        backend = config['BACKEND']
+        entry = {
+            'alias': alias,
+            'backend': backend.rsplit('.', 1)[-1],
+            'location': _safe_location(config.get('LOCATION', '')),
+            'figures': [
+                ('Key prefix', config.get('KEY_PREFIX', '')),
+                ('Default timeout (s)', config.get('TIMEOUT', 300)),
+            ],
+            'error': None,
+        }
+        try:
+            latency, hit = _probe(cache)
+            entry['figures'].append(('Probe set/get/delete (ms)', f'{latency:.2f}'))
+            entry['figures'].append(('Probe read back', 'yes' if hit else 'no'))
+            entry['figures'].extend(_backend_figures(cache, backend))
+        except Exception as e:
+            entry['error'] = str(e)
+        stats.append(entry)
+    return stats
@@ -0,0 +1,237 @@
+"""
+QID -> label resolution for capacities, backed by the CapacityLabel table.
+
+Known QIDs are answered from an in-process map or the database; only the
+misses go to the metabase SPARQL endpoint, split into chunks of at most
+``CHUNK_SIZE`` QIDs that run in parallel. Entries older than ``TTL`` seconds
+are refetched. A QID the endpoint has no label for is stored with an empty
+name and not looked up again for ``MISSING_TTL`` seconds. Settings come from
+``settings.CAPACITY_LABELS`` (see ``DEFAULTS``). ``aresolve`` is the same
+lookup for async views, with the chunks fetched through
+``enrollments.async_http_client``.
+
+One label is kept per QID: when several metabase items share a code, the
+last one the endpoint returns wins (the uncached lookup returned them all).
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from enrollments import async_http_client, http_client
+from enrollments.http_client import UpstreamError
+from enrollments.models import CapacityLabel
+
+
+logger = logging.getLogger(__name__)
+
+METABASE_SPARQL_URL = "https://metabase.wikibase.cloud/query/sparql"
+
+DEFAULTS = {
+    'TTL': 7 * 24 * 3600,
+    # QIDs without a label; short, so a label added on metabase shows up the same day
+    'MISSING_TTL': 6 * 3600,
+    'CHUNK_SIZE': 200,
+    'MAX_WORKERS': 4,
+}
+
+_memory = {}
+_memory_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'CAPACITY_LABELS', {})}
+
+
+def _sparql_literal(value):
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _sparql_request(qids=None):
+    """
+    Keyword arguments of the SPARQL POST looking up ``qids`` (everything when None).
+    """
+    values = ''
+    if qids is not None:
+        values = f'VALUES ?value {{{" ".join(_sparql_literal(qid) for qid in qids)}}}'
+    mb_query_text = f"""PREFIX wbt:<https://metabase.wikibase.cloud/prop/direct/>
+        SELECT ?item ?itemLabel ?value WHERE {{
+            {values}
+            ?item wbt:P67/wbt:P1 ?value.
+            SERVICE wikibase:label {{ bd:serviceParam wikibase:language 'en'. }}
+        }}
+    """
+    return {
+        'data': {"query": mb_query_text},
+        'headers': {"Accept": "application/sparql-results+json"},
+    }
+
+
+def _parse_results(response):
+    if response.status_code != 200:
+        raise UpstreamError(response.status_code)
+
+    # Process the raw results to a consistent format
+    raw_results = response.json().get("results", {}).get("bindings", [])
+    return [
+        {
+            "wd_code": item.get("value", {}).get("value"),
+            "name": item.get("itemLabel", {}).get("value"),
+            "item": item.get("item", {}).get("value"),
+        }
+        for item in raw_results
+        if item.get("item") and item.get("itemLabel") and item.get("value")
+    ]
+
+
+def query_labels(qids=None):
+    """
+    Run the SPARQL label lookup for ``qids``, or for the whole capacity
+    vocabulary when ``qids`` is None.
+    """
+    return _parse_results(http_client.post(METABASE_SPARQL_URL, **_sparql_request(qids)))
+
+
+async def aquery_labels(qids=None):
+    return _parse_results(await async_http_client.post(METABASE_SPARQL_URL, **_sparql_request(qids)))
+
+
+def store(results, missing=()):
+    """
+    Upsert SPARQL results into the database and the in-process map, together
+    with an empty label for each of the ``missing`` QIDs the lookup did not return.
+    """
+    missing = [qid for qid in missing if qid not in {r['wd_code'] for r in results}]
+    if not results and not missing:
+        return
+    now = timezone.now()
+    rows = {qid: CapacityLabel(qid=qid, name='', item='', fetched_at=now) for qid in missing}
+    rows.update(
+        (r['wd_code'], CapacityLabel(qid=r['wd_code'], name=r['name'], item=r['item'], fetched_at=now)) for r in results
+    )
+    kwargs = {'update_conflicts': True, 'update_fields': ['name', 'item', 'fetched_at']}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs['unique_fields'] = ['qid']
+    CapacityLabel.objects.bulk_create(list(rows.values()), **kwargs)
+
+    with _memory_lock:
+        for row in rows.values():
+            _memory[row.qid] = (row.name, row.item, time.time())
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _is_fresh(name, fetched_at, config):
+    return time.time() - fetched_at < (config['TTL'] if name else config['MISSING_TTL'])
+
+
+def _known(qids, config):
+    """
+    ``(found, misses)``: the fresh labels of ``qids`` in memory or in the
+    database, and the QIDs that have to be fetched. QIDs known to have no
+    label are in neither.
+    """
+    found = {}
+    known = set()
+    with _memory_lock:
+        for qid in qids:
+            cached = _memory.get(qid)
+            if cached and _is_fresh(cached[0], cached[2], config):
+                known.add(qid)
+                if cached[0]:
+                    found[qid] = {'wd_code': qid, 'name': cached[0], 'item': cached[1]}
+
+    misses = [q for q in qids if q not in known]
+    if misses:
+        fresh_since = timezone.now() - timedelta(seconds=max(config['TTL'], config['MISSING_TTL']))
+        for label in CapacityLabel.objects.filter(qid__in=misses, fetched_at__gte=fresh_since):
+            fetched_at = label.fetched_at.timestamp()
+            if not _is_fresh(label.name, fetched_at, config):
+                continue
+            known.add(label.qid)
+            if label.name:
+                found[label.qid] = {'wd_code': label.qid, 'name': label.name, 'item': label.item}
+            with _memory_lock:
+                _memory[label.qid] = (label.name, label.item, fetched_at)
+        misses = [q for q in misses if q not in known]
+    return found, misses
+
+
+def resolve(qids):
+    """
+    Return ``[{wd_code, name, item}]`` for the given QIDs, hitting the
+    upstream only for QIDs that are unknown or expired.
+    """
+    config = get_config()
+    qids = list(dict.fromkeys(q for q in qids if isinstance(q, str) and q))
+    found, misses = _known(qids, config)
+
+    if misses:
+        chunks = list(_chunks(misses, config['CHUNK_SIZE']))
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(config['MAX_WORKERS'], len(chunks))) as executor:
+            futures = [executor.submit(query_labels, chunk) for chunk in chunks]
+            for chunk, future in zip(chunks, futures):
+                try:
+                    results = future.result()
+                except UpstreamError as e:
+                    errors.append(e)
+                    continue
+                store(results, missing=chunk)
+                for r in results:
+                    found[r['wd_code']] = r
+        if errors:
+            logger.warning("Capacity label lookup failed for %d of %d chunks", len(errors), len(chunks))
+            if not found:
+                raise errors[0]
+
+    return [found[q] for q in qids if q in found]
+
+
+async def aresolve(qids):
+    """
+    Async ``resolve``: the chunks of misses are fetched concurrently on the event loop.
+    """
+    config = get_config()
+    qids = list(dict.fromkeys(q for q in qids if isinstance(q, str) and q))
+    found, misses = await sync_to_async(_known)(qids, config)
+
+    if misses:
+        chunks = list(_chunks(misses, config['CHUNK_SIZE']))
+        outcomes = await asyncio.gather(*(aquery_labels(chunk) for chunk in chunks), return_exceptions=True)
+        errors = []
+        for chunk, outcome in zip(chunks, outcomes):
+            if isinstance(outcome, UpstreamError):
+                errors.append(outcome)
+                continue
+            if isinstance(outcome, BaseException):
+                raise outcome
+            await sync_to_async(store)(outcome, missing=chunk)
+            for r in outcome:
+                found[r['wd_code']] = r
+        if errors:
+            logger.warning("Capacity label lookup failed for %d of %d chunks", len(errors), len(chunks))
+            if not found:
+                raise errors[0]
+
+    return [found[q] for q in qids if q in found]
+
+
+def clear_memory():
+    with _memory_lock:
+        _memory.clear()
+
+
+def memory_size():
+    with _memory_lock:
+        return len(_memory)
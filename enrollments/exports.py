@@ -0,0 +1,179 @@
+"""
+Streaming exports of the enrollments table (Enrollment rows plus the
+Profiles that never enrolled) as CSV, JSONL or XLSX.
+
+Rows are read with ``.iterator(chunk_size=...)`` and written out one at a
+time, so memory stays flat whatever the number of rows. The XLSX writer
+emits a minimal SpreadsheetML package through ``zipfile`` without any
+third-party dependency.
+"""
+import csv
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+from enrollments import listing
+
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+TIMESTAMP_COLUMN = 'enrollment_time'
+
+
+def export_columns():
+    return listing.enrollment_keys() + [TIMESTAMP_COLUMN]
+
+
+def iter_records(query=''):
+    """
+    Yield one dict per row, keyed by column name, with raw (JSON) values.
+    """
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    for enrollment in listing.enrollment_queryset(query).order_by('id').iterator(chunk_size=chunk_size):
+        row = listing.enrollment_row(enrollment)
+        yield {**row['data'], TIMESTAMP_COLUMN: row['timestamp']}
+    for profile in listing.profile_queryset(query).order_by('id').iterator(chunk_size=chunk_size):
+        row = listing.profile_row(profile)
+        yield {**row['data'], TIMESTAMP_COLUMN: row['timestamp']}
+
+
+def format_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ', '.join(format_value(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class Echo:
+    """
+    File-like object whose ``write`` returns the value instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for record in records:
+        yield writer.writerow([format_value(record.get(column)) for column in columns])
+
+
+def stream_jsonl(columns, records):
+    for record in records:
+        yield json.dumps({column: record.get(column) for column in columns}, ensure_ascii=False) + '\n'
+
+
+class _ChunkBuffer:
+    """
+    Unseekable sink for zipfile; drained by the generator after every write burst.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_XLSX_STATIC_PARTS = (
+    ('[Content_Types].xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    )),
+    ('_rels/.rels', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    )),
+    ('xl/workbook.xml', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Enrollments" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )),
+    ('xl/_rels/workbook.xml.rels', (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )),
+)
+
+
+def _xlsx_row(values):
+    cells = ''.join(
+        '<c t="inlineStr"><is><t xml:space="preserve">%s</t></is></c>' % escape(_ILLEGAL_XML_CHARS.sub('', v))
+        for v in values
+    )
+    return ('<row>%s</row>' % cells).encode('utf-8')
+
+
+def stream_xlsx(columns, records, flush_size=64 * 1024):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+        for name, content in _XLSX_STATIC_PARTS:
+            package.writestr(name, content)
+        yield buffer.drain()
+
+        with package.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(columns))
+            for record in records:
+                sheet.write(_xlsx_row([format_value(record.get(column)) for column in columns]))
+                if buffer.size >= flush_size:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def stream(export_format, query=''):
+    """
+    Generator of the encoded export in ``export_format`` (a key of FORMATS).
+    """
+    columns = export_columns()
+    records = iter_records(query)
+    if export_format == 'xlsx':
+        return stream_xlsx(columns, records)
+    if export_format == 'jsonl':
+        return (line.encode('utf-8') for line in stream_jsonl(columns, records))
+    return (line.encode('utf-8') for line in stream_csv(columns, records))
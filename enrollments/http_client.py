@@ -0,0 +1,222 @@
+"""
+Shared outbound HTTP client for the external services we proxy
+(capx-backend.toolforge.org, metabase.wikibase.cloud).
+
+Every host gets its own pooled, keep-alive ``requests.Session`` with
+connect/read timeouts, a bounded retry budget with exponential backoff and
+a circuit breaker, so one slow upstream cannot hold WSGI workers forever.
+Settings are read from ``settings.OUTBOUND_HTTP`` (see ``DEFAULTS``).
+"""
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 15,
+    'POOL_CONNECTIONS': 4,
+    'POOL_MAXSIZE': 16,
+    'MAX_RETRIES': 2,
+    'BACKOFF_FACTOR': 0.3,
+    'RETRY_STATUSES': (502, 503, 504),
+    # SPARQL lookups are read-only, so POST is safe to retry as well
+    'RETRY_METHODS': ('GET', 'HEAD', 'OPTIONS', 'POST'),
+    'BREAKER_THRESHOLD': 5,
+    'BREAKER_COOLDOWN': 30,
+    'USER_AGENT': 'CapX/1.0',
+    # used by enrollments.async_http_client
+    'ASYNC_BACKEND': 'threads',
+    'MAX_CONCURRENCY': 100,
+}
+
+KEEPALIVE_SOCKET_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+for _name, _value in (('TCP_KEEPIDLE', 60), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3)):
+    if hasattr(socket, _name):
+        KEEPALIVE_SOCKET_OPTIONS.append((socket.IPPROTO_TCP, getattr(socket, _name), _value))
+
+
+class UpstreamError(Exception):
+    """
+    Raised when an external service answers with an unusable status.
+    """
+    def __init__(self, status_code, message=None):
+        super().__init__(message or f"Upstream returned status {status_code}")
+        self.status_code = status_code
+
+
+class UpstreamUnavailable(UpstreamError):
+    """
+    Raised when an upstream cannot be reached: connection failure, timeout
+    or an open circuit breaker.
+    """
+    def __init__(self, message, status_code=502):
+        super().__init__(status_code, message)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'OUTBOUND_HTTP', {})}
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that enables TCP keep-alive on pooled connections.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + KEEPALIVE_SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker. After ``threshold`` consecutive failures the
+    circuit opens and calls fail fast for ``cooldown`` seconds; then a single
+    trial call is let through (half-open) to decide whether to close it again.
+    """
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class OutboundClient:
+    """
+    Holds one session and one circuit breaker per upstream host.
+    """
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self._sessions = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _build_session(self):
+        config = self.config
+        retry = Retry(
+            total=config['MAX_RETRIES'],
+            connect=config['MAX_RETRIES'],
+            read=config['MAX_RETRIES'],
+            status=config['MAX_RETRIES'],
+            backoff_factor=config['BACKOFF_FACTOR'],
+            status_forcelist=config['RETRY_STATUSES'],
+            allowed_methods=frozenset(config['RETRY_METHODS']),
+            raise_on_status=False,
+        )
+        adapter = KeepAliveAdapter(
+            pool_connections=config['POOL_CONNECTIONS'],
+            pool_maxsize=config['POOL_MAXSIZE'],
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.headers['User-Agent'] = config['USER_AGENT']
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _for_host(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                self._sessions[host] = self._build_session()
+                self._breakers[host] = CircuitBreaker(
+                    self.config['BREAKER_THRESHOLD'], self.config['BREAKER_COOLDOWN']
+                )
+            return self._sessions[host], self._breakers[host]
+
+    def request(self, method, url, **kwargs):
+        host = urlsplit(url).netloc
+        session, breaker = self._for_host(host)
+        if not breaker.allow():
+            raise UpstreamUnavailable(f"Circuit open for {host}", status_code=503)
+
+        kwargs.setdefault('timeout', (self.config['CONNECT_TIMEOUT'], self.config['READ_TIMEOUT']))
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.Timeout as e:
+            breaker.record_failure()
+            raise UpstreamUnavailable(f"Timed out talking to {host}: {e}", status_code=504) from e
+        except requests.RequestException as e:
+            breaker.record_failure()
+            raise UpstreamUnavailable(f"Could not reach {host}: {e}") from e
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+    def breaker_states(self):
+        return {host: breaker.state for host, breaker in self._breakers.items()}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide client, creating it on first use.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OutboundClient()
+    return _client
+
+
+def reset_client():
+    """
+    Drop the process-wide client (used by tests and after settings changes).
+    """
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def get(url, **kwargs):
+    return get_client().request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_client().request('POST', url, **kwargs)
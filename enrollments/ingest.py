@@ -0,0 +1,99 @@
+"""
+Write path of the enrollment webhook: merge a verified payload into the
+user's Enrollment and store a fresh confirmation code in one transaction.
+
+The existing row is read with SELECT ... FOR UPDATE (on SQLite, which has
+no row locks, after a write that takes the database lock), so concurrent
+submissions for the same user are applied one after the other instead of
+overwriting each other's merge; the merged data and the confirmation code
+go out in a single UPDATE. Lock conflicts (MySQL deadlocks, SQLite's
+"database is locked") are retried a few times with a short backoff.
+"""
+import hashlib
+import logging
+import random
+import time
+import uuid
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+
+from enrollments import key_index
+from enrollments.models import Enrollment
+
+
+logger = logging.getLogger(__name__)
+
+# Submitted values that never overwrite what is already stored
+EMPTY_VALUES = [None, '', 0, 'null']
+MAX_ATTEMPTS = 5
+
+
+def merge_data(previous, incoming):
+    """
+    ``previous`` updated with the non-empty values of ``incoming``.
+    """
+    merged = dict(previous or {})
+    for k, v in incoming.items():
+        if v not in EMPTY_VALUES:
+            merged[k] = v
+    return merged
+
+
+def new_confirmation_code(user):
+    return hashlib.sha256(f"{user}-{uuid.uuid4()}".encode()).hexdigest()
+
+
+def _upsert_once(data, confirmation_code):
+    user = data.get('user')
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            enrollment = Enrollment.objects.select_for_update().filter(user=user).first()
+        else:
+            # write first: a deferred SQLite transaction that reads before
+            # writing fails outright when another writer commits in between
+            Enrollment.objects.filter(user=user).update(confirmation_code=confirmation_code)
+            enrollment = Enrollment.objects.filter(user=user).first()
+        if enrollment is None:
+            try:
+                # savepoint, so a concurrent insert for the same user can be recovered from
+                with transaction.atomic():
+                    enrollment = Enrollment.objects.create(user=user, data=data, confirmation_code=confirmation_code)
+                return enrollment, None
+            except IntegrityError:
+                enrollment = Enrollment.objects.select_for_update().get(user=user)
+
+        previous_data = enrollment.data or {}
+        enrollment.data = merge_data(previous_data, data)
+        enrollment.confirmation_code = confirmation_code
+        # the username is unchanged, so no post_save work is needed
+        Enrollment.objects.filter(pk=enrollment.pk).update(data=enrollment.data, confirmation_code=confirmation_code)
+        return enrollment, previous_data
+
+
+def _retrying(func, *args):
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return func(*args)
+        except OperationalError:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+
+
+def upsert(data):
+    """
+    Store a decoded webhook payload and return ``(enrollment, confirmation_code)``.
+    """
+    if not data.get('user'):
+        raise ValueError('User is required')
+
+    confirmation_code = new_confirmation_code(data['user'])
+    enrollment, previous_data = _retrying(_upsert_once, data, confirmation_code)
+
+    # outside the transaction, so the row lock is held as briefly as possible;
+    # the data is already stored, so a failure here must not fail the request
+    try:
+        _retrying(key_index.record, enrollment.data, previous_data)
+    except OperationalError:
+        logger.warning("Key index not updated for %s; run rebuild_enrollment_keys", data['user'], exc_info=True)
+    return enrollment, confirmation_code
@@ -0,0 +1,143 @@
+"""
+Queued ingestion of enrollment webhook submissions.
+
+With ``ENROLLMENT_INGEST['QUEUED']`` on, the webhook only verifies the token
+and stores the payload in the QueuedEnrollment table (a single INSERT), then
+answers with the confirmation code it will be stored under. The
+process_enrollment_queue command applies the queue in batches: every
+submission of a batch is merged in arrival order with ``ingest.merge_data``,
+and the affected enrollments are written with one bulk insert and one bulk
+update in the same transaction that deletes the applied rows.
+
+Batches are claimed with SELECT ... FOR UPDATE SKIP LOCKED where available,
+so several workers can drain the queue; on SQLite a worker whose batch was
+taken by another fails to commit and is retried with the rows that are left.
+"""
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from enrollments import ingest, key_index, username_search
+from enrollments.models import Enrollment, QueuedEnrollment
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'QUEUED': False,
+    'BATCH_SIZE': 200,
+    'POLL_INTERVAL': 1.0,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'ENROLLMENT_INGEST', {})}
+
+
+def is_enabled():
+    return bool(get_config()['QUEUED'])
+
+
+def enqueue(data):
+    """
+    Queue a decoded webhook payload and return the confirmation code it will be stored with.
+    """
+    if not data.get('user'):
+        raise ValueError('User is required')
+    confirmation_code = ingest.new_confirmation_code(data['user'])
+    QueuedEnrollment.objects.create(user=data['user'], data=data, confirmation_code=confirmation_code)
+    return confirmation_code
+
+
+def _apply_batch(batch_size):
+    """
+    Apply the oldest ``batch_size`` queued submissions. Returns the number of
+    submissions, the new usernames and ``(data, previous_data)`` per changed enrollment.
+    """
+    with transaction.atomic():
+        queue = QueuedEnrollment.objects.order_by('id').select_for_update(
+            skip_locked=connection.features.has_select_for_update_skip_locked,
+        )
+        rows = list(queue[:batch_size])
+        if not rows:
+            return 0, [], []
+
+        existing = {
+            enrollment.user: enrollment
+            for enrollment in Enrollment.objects.select_for_update().filter(user__in={row.user for row in rows})
+        }
+        previous = {user: enrollment.data or {} for user, enrollment in existing.items()}
+        created = {}
+        for row in rows:
+            enrollment = existing.get(row.user) or created.get(row.user)
+            if enrollment is None:
+                # stored as submitted, like a first submission through ingest.upsert
+                created[row.user] = Enrollment(user=row.user, data=row.data, confirmation_code=row.confirmation_code)
+                continue
+            enrollment.data = ingest.merge_data(enrollment.data, row.data)
+            enrollment.confirmation_code = row.confirmation_code
+
+        if created:
+            Enrollment.objects.bulk_create(created.values())
+        if existing:
+            Enrollment.objects.bulk_update(existing.values(), ['data', 'confirmation_code'])
+        QueuedEnrollment.objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+    changes = [(enrollment.data, previous[user]) for user, enrollment in existing.items()]
+    changes += [(enrollment.data, None) for enrollment in created.values()]
+    return len(rows), list(created), changes
+
+
+def drain(batch_size=None, max_batches=None, on_batch=None):
+    """
+    Apply queued submissions until the queue is empty (or ``max_batches`` were
+    applied) and return how many were applied. After every batch,
+    ``on_batch(count, enrollments)`` is called with two integers: the number
+    of submissions the batch applied and the number of enrollments they changed.
+    """
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    applied = batches = conflicts = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            count, new_users, changes = ingest._retrying(_apply_batch, batch_size)
+        except IntegrityError:
+            # an enrollment was created outside the queue meanwhile; the next
+            # attempt finds and merges into it
+            conflicts += 1
+            if conflicts >= ingest.MAX_ATTEMPTS:
+                raise
+            continue
+        if not count:
+            break
+        conflicts = 0
+        batches += 1
+        applied += count
+
+        # bulk writes send no post_save, so do the Enrollment signal's work here
+        username_search.register(new_users, 'enrollment')
+        for data, previous_data in changes:
+            try:
+                ingest._retrying(key_index.record, data, previous_data)
+            except OperationalError:
+                logger.warning("Key index not updated; run rebuild_enrollment_keys", exc_info=True)
+        if on_batch:
+            on_batch(count, len(changes))
+    return applied
+
+
+def stats():
+    """
+    Queue depth and lag: the number of waiting submissions and the age in
+    seconds of the oldest one (0 when the queue is empty).
+    """
+    figures = QueuedEnrollment.objects.aggregate(depth=Count('id'), oldest=Min('received_at'))
+    lag = (timezone.now() - figures['oldest']).total_seconds() if figures['oldest'] else 0.0
+    return {
+        'queued_mode': is_enabled(),
+        'depth': figures['depth'],
+        'oldest': figures['oldest'],
+        'lag_seconds': round(max(lag, 0.0), 3),
+    }
@@ -0,0 +1,115 @@
+"""
+Incrementally maintained index of the keys used in the dynamic
+``Enrollment.data`` JSON. Column discovery reads the EnrollmentKey table in
+O(keys) instead of scanning every enrollment.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from enrollments.models import Enrollment, EnrollmentKey
+
+
+# seconds; last_seen is only a rough "still in use" marker
+LAST_SEEN_INTERVAL = 3600
+
+
+def value_type(value):
+    """
+    JSON type name of a value.
+    """
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return 'array'
+    return 'object'
+
+
+def record(new_data, old_data=None):
+    """
+    Update the index after an enrollment's data went from ``old_data`` to
+    ``new_data``. Keys that are new to this enrollment count as one more occurrence.
+
+    Every submission touches the same few rows, so only what changed is
+    written: unknown keys are inserted, occurrences and value types are
+    updated when they change, and ``last_seen`` is moved at most once every
+    ``LAST_SEEN_INTERVAL`` seconds. No lock is held across the statements.
+    """
+    new_data = new_data or {}
+    old_data = old_data or {}
+    if not new_data:
+        return
+
+    now = timezone.now()
+    names = list(new_data)
+    added = [name for name in names if name not in old_data]
+
+    existing = {key.name: key for key in EnrollmentKey.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in existing]
+    if missing:
+        EnrollmentKey.objects.bulk_create(
+            [EnrollmentKey(name=name, first_seen=now, last_seen=now) for name in missing],
+            ignore_conflicts=True,
+        )
+    if added:
+        EnrollmentKey.objects.filter(name__in=added).update(occurrences=F('occurrences') + 1)
+
+    cutoff = now - timedelta(seconds=LAST_SEEN_INTERVAL)
+    outdated = [name for name, key in existing.items() if key.last_seen < cutoff]
+    if outdated:
+        # the filter repeats the check, so concurrent submissions update each row once
+        EnrollmentKey.objects.filter(name__in=outdated, last_seen__lt=cutoff).update(last_seen=now)
+
+    for name in names:
+        known = existing[name].value_types if name in existing else []
+        seen = value_type(new_data[name])
+        if seen not in known:
+            with transaction.atomic():
+                key = EnrollmentKey.objects.select_for_update().get(name=name)
+                if seen not in key.value_types:
+                    key.value_types = sorted(key.value_types + [seen])
+                    key.save(update_fields=['value_types'])
+
+
+def rebuild(chunk_size=2000):
+    """
+    Recompute the whole index from the Enrollment table.
+    """
+    stats = {}
+    for timestamp, data in Enrollment.objects.values_list('timestamp', 'data').iterator(chunk_size=chunk_size):
+        for name, value in (data or {}).items():
+            entry = stats.setdefault(name, {'first_seen': timestamp, 'last_seen': timestamp, 'occurrences': 0, 'types': set()})
+            entry['first_seen'] = min(entry['first_seen'], timestamp)
+            entry['last_seen'] = max(entry['last_seen'], timestamp)
+            entry['occurrences'] += 1
+            entry['types'].add(value_type(value))
+
+    with transaction.atomic():
+        EnrollmentKey.objects.all().delete()
+        EnrollmentKey.objects.bulk_create([
+            EnrollmentKey(
+                name=name,
+                first_seen=entry['first_seen'],
+                last_seen=entry['last_seen'],
+                occurrences=entry['occurrences'],
+                value_types=sorted(entry['types']),
+            )
+            for name, entry in stats.items()
+        ])
+    return len(stats)
+
+
+def key_names():
+    """
+    Names of every indexed key. The index is populated by migration 0010 and
+    can be recomputed with the rebuild_enrollment_keys command.
+    """
+    return list(EnrollmentKey.objects.filter(occurrences__gt=0).values_list('name', flat=True))
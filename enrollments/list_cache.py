@@ -0,0 +1,194 @@
+"""
+Response cache for the CapX reference lists served by ``/proxy/?item=<list>``.
+
+Entries live in two tiers: a small in-process LRU (bounded by
+``MAX_ENTRIES``) in front of Django's cache framework, so the shared tier can
+be local memory, a file or a database table. Each list has its own TTL;
+once an entry is past its TTL it is still served for ``STALE_WHILE_REVALIDATE``
+seconds while a background refresh revalidates it against the upstream with
+``If-None-Match``/``If-Modified-Since``. Missing or fully expired entries
+are fetched in the request, one caller per list at a time: the others wait
+and use its result. Settings come from ``settings.PROXY_LIST_CACHE`` (see
+``DEFAULTS``).
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from enrollments import http_client
+from enrollments.http_client import UpstreamError
+
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'proxy-list',
+    'TTL': 3600,
+    # Per-list overrides; the users list grows as people sign up
+    'TTLS': {
+        'users': 300,
+        'badges': 900,
+    },
+    'STALE_WHILE_REVALIDATE': 86400,
+    'MAX_ENTRIES': 32,
+    'REFRESH_LOCK_TIMEOUT': 60,
+}
+
+CACHEABLE_LISTS = ('territory', 'affiliation', 'wikimedia_project', 'skills', 'badges', 'language', 'users')
+
+
+def content_etag(data):
+    """
+    Strong ETag derived from the JSON payload.
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':')).encode()
+    return '"%s"' % hashlib.sha1(payload).hexdigest()
+
+
+class ListCache:
+    """
+    TTL + LRU cache with stale-while-revalidate for one upstream list URL
+    template (``url_template.format(item=...)``).
+    """
+    def __init__(self, url_template):
+        self.url_template = url_template
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+
+    def __len__(self):
+        return len(self._lru)
+
+    @property
+    def config(self):
+        config = {**DEFAULTS, **getattr(settings, 'PROXY_LIST_CACHE', {})}
+        config['TTLS'] = {**DEFAULTS['TTLS'], **config.get('TTLS', {})}
+        return config
+
+    @property
+    def cache(self):
+        return caches[self.config['CACHE_ALIAS']]
+
+    def ttl_for(self, item):
+        config = self.config
+        return config['TTLS'].get(item, config['TTL'])
+
+    def _key(self, item):
+        return f"{self.config['KEY_PREFIX']}:{item}"
+
+    def _remember(self, item, entry):
+        with self._lock:
+            self._lru[item] = entry
+            self._lru.move_to_end(item)
+            while len(self._lru) > self.config['MAX_ENTRIES']:
+                self._lru.popitem(last=False)
+
+    def _fetch_lock(self, item):
+        with self._lock:
+            return self._fetch_locks.setdefault(item, threading.Lock())
+
+    def _lookup(self, item):
+        ttl = self.ttl_for(item)
+        with self._lock:
+            entry = self._lru.get(item)
+            if entry is not None:
+                self._lru.move_to_end(item)
+        if entry is not None and time.time() - entry['fetched_at'] < ttl:
+            return entry
+        # The local copy is missing or expired; another process may have refreshed it
+        shared = self.cache.get(self._key(item))
+        if shared is not None and (entry is None or shared['fetched_at'] > entry['fetched_at']):
+            self._remember(item, shared)
+            return shared
+        return entry
+
+    def _store(self, item, entry):
+        timeout = self.ttl_for(item) + self.config['STALE_WHILE_REVALIDATE']
+        self.cache.set(self._key(item), entry, timeout=timeout)
+        self._remember(item, entry)
+
+    def refresh(self, item, entry=None):
+        """
+        Fetch ``item`` from the upstream, revalidating ``entry`` if given.
+        """
+        headers = {}
+        if entry:
+            if entry.get('upstream_etag'):
+                headers['If-None-Match'] = entry['upstream_etag']
+            if entry.get('upstream_last_modified'):
+                headers['If-Modified-Since'] = entry['upstream_last_modified']
+
+        response = http_client.get(self.url_template.format(item=item), headers=headers)
+        if response.status_code == 304 and entry:
+            fresh = {**entry, 'fetched_at': time.time()}
+        elif response.status_code == 200:
+            data = response.json()
+            fresh = {
+                'data': data,
+                'etag': content_etag(data),
+                'upstream_etag': response.headers.get('ETag'),
+                'upstream_last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+            }
+        else:
+            raise UpstreamError(response.status_code)
+        self._store(item, fresh)
+        return fresh
+
+    def _refresh_in_background(self, item, entry):
+        lock_key = self._key(item) + ':refreshing'
+        if not self.cache.add(lock_key, 1, timeout=self.config['REFRESH_LOCK_TIMEOUT']):
+            return
+
+        def run():
+            try:
+                self.refresh(item, entry)
+            except UpstreamError:
+                pass
+            finally:
+                self.cache.delete(lock_key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get(self, item):
+        """
+        Return the cache entry for ``item``, fetching or revalidating as needed.
+        Raises UpstreamError only when nothing usable is cached.
+        """
+        entry = self._lookup(item)
+        if entry is not None:
+            age = time.time() - entry['fetched_at']
+            ttl = self.ttl_for(item)
+            if age < ttl:
+                return entry
+            if age < ttl + self.config['STALE_WHILE_REVALIDATE']:
+                self._refresh_in_background(item, entry)
+                return entry
+
+        with self._fetch_lock(item):
+            # another caller may have fetched it while this one waited
+            entry = self._lookup(item) or entry
+            if entry is not None and time.time() - entry['fetched_at'] < self.ttl_for(item):
+                return entry
+            try:
+                return self.refresh(item, entry)
+            except UpstreamError:
+                if entry is not None:
+                    return entry
+                raise
+
+    def max_age(self, item, entry):
+        """
+        Seconds the entry stays fresh, for the Cache-Control header.
+        """
+        return max(0, int(self.ttl_for(item) - (time.time() - entry['fetched_at'])))
+
+    def clear(self):
+        with self._lock:
+            items = list(self._lru)
+            self._lru.clear()
+        self.cache.delete_many([self._key(item) for item in set(items) | set(CACHEABLE_LISTS)])
@@ -0,0 +1,182 @@
+"""
+Database-side listing of the enrollments table: every Enrollment plus the
+Profiles that never enrolled, sorted on any key of the dynamic ``data``
+JSON, filtered with a case-insensitive text search and paginated with an
+opaque keyset cursor. Both row kinds are combined with a SQL UNION so
+sorting and filtering never load the whole table into Python.
+"""
+import base64
+import json
+
+from django.db.models import Case, CharField, Exists, F, IntegerField, OuterRef, Q, Value, When
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Cast, Coalesce, Lower
+from django.db.models.lookups import IContains
+
+from enrollments import key_index
+from enrollments.models import Enrollment, Profile
+
+
+HIDDEN_KEYS = {'timestamp', 'nonce'}
+# Profile fields exposed under the same names the enrollment data uses
+PROFILE_FIELDS = {'user': 'username', 'email': 'email', 'full_name': 'full_name'}
+
+ENROLLMENT_KIND = 0
+PROFILE_KIND = 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def enrollment_keys():
+    """
+    Column names of the enrollments table: the union of every ``data`` key,
+    read from the key index.
+    """
+    all_keys = set(key_index.key_names())
+    all_keys -= HIDDEN_KEYS
+    all_keys.add("legacy")
+    return sorted(all_keys, key=lambda x: (x != "user", x))
+
+
+def encode_cursor(row):
+    raw = json.dumps([row['sort_value'], row['kind'], row['row_id']])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, kind, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(sort_value), int(kind), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _text(expression):
+    return Coalesce(Lower(Cast(expression, CharField())), Value(''), output_field=CharField())
+
+
+def _enrollment_sort_expression(key):
+    if key == 'timestamp':
+        return Coalesce(Cast('timestamp', CharField()), Value(''), output_field=CharField())
+    if key == 'legacy':
+        return Case(When(legacy=True, then=Value('1')), default=Value('0'), output_field=CharField())
+    if key == 'user':
+        return _text(F('user'))
+    return _text(KeyTextTransform(key, 'data'))
+
+
+def _profile_sort_expression(key):
+    if key in PROFILE_FIELDS:
+        return _text(F(PROFILE_FIELDS[key]))
+    if key == 'legacy':
+        return Value('1', output_field=CharField())
+    return Value('', output_field=CharField())
+
+
+def enrollment_queryset(query=''):
+    queryset = Enrollment.objects.annotate(
+        legacy=Exists(Profile.objects.filter(username=OuterRef('user'))),
+    )
+    if query:
+        # the values of the shown columns only, never the key names of the JSON
+        condition = Q(user__icontains=query)
+        for key in set(key_index.key_names()) - HIDDEN_KEYS:
+            condition |= IContains(KeyTextTransform(key, 'data'), query)
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def profile_queryset(query=''):
+    queryset = Profile.objects.exclude(username__in=Enrollment.objects.values('user'))
+    if query:
+        queryset = queryset.filter(
+            Q(username__icontains=query) | Q(email__icontains=query) | Q(full_name__icontains=query)
+        )
+    return queryset
+
+
+def _after_cursor(kind, cursor, descending):
+    """
+    Keyset condition selecting the rows of ``kind`` that come after ``cursor``
+    in (sort_value, kind, row_id) order.
+    """
+    sort_value, cursor_kind, row_id = cursor
+    after, after_or_equal = ('sort_value__lt', 'sort_value__lte') if descending else ('sort_value__gt', 'sort_value__gte')
+    later_kind = kind < cursor_kind if descending else kind > cursor_kind
+    if kind == cursor_kind:
+        id_after = 'row_id__lt' if descending else 'row_id__gt'
+        return Q(**{after: sort_value}) | Q(sort_value=sort_value, **{id_after: row_id})
+    if later_kind:
+        return Q(**{after_or_equal: sort_value})
+    return Q(**{after: sort_value})
+
+
+def page(sort='user', descending=False, query='', cursor=None, limit=100):
+    """
+    Return ``(rows, next_cursor)`` for one page of the enrollments table.
+    """
+    columns = ('kind', 'row_id', 'sort_value')
+    enrollments = enrollment_queryset(query).annotate(
+        kind=Value(ENROLLMENT_KIND, output_field=IntegerField()),
+        row_id=F('id'),
+        sort_value=_enrollment_sort_expression(sort),
+    )
+    profiles = profile_queryset(query).annotate(
+        kind=Value(PROFILE_KIND, output_field=IntegerField()),
+        row_id=F('id'),
+        sort_value=_profile_sort_expression(sort),
+    )
+    if cursor is not None:
+        enrollments = enrollments.filter(_after_cursor(ENROLLMENT_KIND, cursor, descending))
+        profiles = profiles.filter(_after_cursor(PROFILE_KIND, cursor, descending))
+
+    prefix = '-' if descending else ''
+    combined = enrollments.values(*columns).union(profiles.values(*columns), all=True)
+    keys = list(combined.order_by(*(prefix + c for c in ('sort_value', 'kind', 'row_id')))[:limit + 1])
+
+    next_cursor = encode_cursor(keys[limit - 1]) if len(keys) > limit else None
+    keys = keys[:limit]
+    return hydrate(keys), next_cursor
+
+
+def hydrate(keys):
+    """
+    Load the full rows for a page of (kind, row_id) keys, preserving order.
+    """
+    enrollment_ids = [k['row_id'] for k in keys if k['kind'] == ENROLLMENT_KIND]
+    profile_ids = [k['row_id'] for k in keys if k['kind'] == PROFILE_KIND]
+    enrollments = enrollment_queryset().in_bulk(enrollment_ids)
+    profiles = Profile.objects.in_bulk(profile_ids)
+
+    rows = []
+    for k in keys:
+        if k['kind'] == ENROLLMENT_KIND:
+            rows.append(enrollment_row(enrollments[k['row_id']]))
+        else:
+            rows.append(profile_row(profiles[k['row_id']]))
+    return rows
+
+
+def enrollment_row(enrollment):
+    data = dict(enrollment.data or {})
+    data['legacy'] = bool(getattr(enrollment, 'legacy', False))
+    return {
+        'user': enrollment.user,
+        'data': data,
+        'timestamp': enrollment.timestamp.isoformat() if enrollment.timestamp else None,
+    }
+
+
+def profile_row(profile):
+    return {
+        'user': profile.username,
+        'data': {
+            'user': profile.username,
+            'email': profile.email,
+            'full_name': profile.full_name,
+            'legacy': True,
+        },
+        'timestamp': None,
+    }
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from wsgiref.simple_server import make_server
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+from django.test import Client, override_settings
+
+from credentials.models import CustomUser
+from enrollments import async_http_client, views
+from enrollments.management.commands.benchmark_requests import PooledWSGIServer, QuietHandler
+
+try:
+    import httpx
+    import uvicorn
+except ImportError:
+    httpx = uvicorn = None
+
+BENCHMARK_USER = 'benchmark-async-proxy'
+
+
+class StubUpstream(ThreadingHTTPServer):
+    """
+    Stand-in for capx-backend: answers every GET with a small JSON page after
+    ``delay`` seconds, counting the calls and the peak number in flight.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, delay):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = delay
+        self.in_flight = self.peak = self.calls = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.calls += 1
+            server.peak = max(server.peak, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        body = json.dumps({'count': 1, 'results': [{'path': self.path}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class BacklogWSGIServer(PooledWSGIServer):
+    request_queue_size = 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare proxy throughput under WSGI (a fixed pool of worker threads) and ASGI "
+        "(one event loop with the httpx client) against a local stub upstream. "
+        "Needs httpx and uvicorn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests per server')
+        parser.add_argument('--concurrency', type=int, default=200, help='Concurrent clients')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--delay', type=float, default=0.2, help='Upstream latency in seconds')
+        parser.add_argument('--same-query', action='store_true',
+                            help='Send the same query every time, so identical calls are coalesced')
+
+    def handle(self, *args, **options):
+        if httpx is None or uvicorn is None:
+            raise CommandError("benchmark_async_proxy needs the httpx and uvicorn packages")
+        total = max(options['requests'], 1)
+        concurrency = max(options['concurrency'], 1)
+        threads = max(options['threads'], 1)
+
+        upstream = StubUpstream(options['delay'])
+        threading.Thread(target=upstream.serve_forever, daemon=True).start()
+        capx_api_url = views.CAPX_API_URL
+        views.CAPX_API_URL = f'http://127.0.0.1:{upstream.server_port}'
+
+        user, _ = CustomUser.objects.get_or_create(username=BENCHMARK_USER, defaults={'is_approved': True})
+        client = Client()
+        client.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else '127.0.0.1'
+        headers = {'Host': host, 'Cookie': cookie}
+
+        self.stdout.write(
+            f"{total} GET /proxy/?query=... per server, {concurrency} concurrent clients, "
+            f"upstream latency {options['delay'] * 1000:.0f} ms"
+            + (", all identical" if options['same_query'] else "")
+        )
+        queries = ['page=1' if options['same_query'] else f'page={n}' for n in range(1, total + 1)]
+        try:
+            base_url, stop = self.start_wsgi(threads)
+            try:
+                self.report(f"WSGI, {threads} threads", upstream, self.load(upstream, base_url, headers, queries, concurrency))
+            finally:
+                stop()
+
+            outbound = {**getattr(settings, 'OUTBOUND_HTTP', {}), 'ASYNC_BACKEND': 'httpx'}
+            with override_settings(OUTBOUND_HTTP=outbound):
+                async_http_client.reset_client()
+                base_url, stop = self.start_asgi()
+                try:
+                    self.report("ASGI, 1 event loop", upstream, self.load(upstream, base_url, headers, queries, concurrency))
+                finally:
+                    stop()
+                    async_http_client.reset_client()
+        finally:
+            views.CAPX_API_URL = capx_api_url
+            upstream.shutdown()
+            upstream.server_close()
+            connections.close_all()
+            CustomUser.objects.filter(username=BENCHMARK_USER).delete()
+
+    def start_wsgi(self, threads):
+        server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                             server_class=BacklogWSGIServer, handler_class=QuietHandler)
+        server.pool = ThreadPoolExecutor(max_workers=threads)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+            server.pool.shutdown()
+        return f'http://127.0.0.1:{server.server_port}', stop
+
+    def start_asgi(self):
+        config = uvicorn.Config(get_asgi_application(), host='127.0.0.1', port=0,
+                                lifespan='off', log_level='warning', backlog=2048)
+        server = uvicorn.Server(config)
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+
+        def stop():
+            server.should_exit = True
+            thread.join()
+        return f'http://127.0.0.1:{port}', stop
+
+    def load(self, upstream, base_url, headers, queries, concurrency):
+        async def run():
+            slots = asyncio.Semaphore(concurrency)
+            # no keep-alive, so both servers pay for a new connection per request
+            limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+            async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=120) as client:
+                async def one(query):
+                    async with slots:
+                        started = time.perf_counter()
+                        response = await client.get('/proxy/', params={'query': query})
+                        return (time.perf_counter() - started) * 1000, response.status_code
+
+                await one('page=0')  # warm up
+                upstream.calls = upstream.peak = 0
+                started = time.perf_counter()
+                results = await asyncio.gather(*(one(query) for query in queries))
+                return results, time.perf_counter() - started
+        return asyncio.run(run())
+
+    def report(self, label, upstream, outcome):
+        results, elapsed = outcome
+        latencies = sorted(latency for latency, status in results)
+        statuses = sorted({status for latency, status in results})
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{label}"))
+        self.stdout.write(
+            f"  status {statuses}: {len(results) / elapsed:.0f} req/s, "
+            f"mean {statistics.mean(latencies):.0f} ms, p50 {latencies[len(latencies) // 2]:.0f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.0f} ms, "
+            f"{upstream.calls} upstream calls, at most {upstream.peak} in flight"
+        )
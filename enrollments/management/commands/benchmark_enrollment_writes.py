@@ -0,0 +1,96 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from enrollments import ingest, key_index
+from enrollments.models import Enrollment
+
+USER_PREFIX = 'benchmark-user-'
+
+
+def unlocked_upsert(data):
+    """
+    The previous webhook write path (read, merge in Python, save, save again),
+    kept here to show the lost updates it allows.
+    """
+    try:
+        enrollment = Enrollment.objects.get(user=data['user'])
+        enrollment.data = ingest.merge_data(enrollment.data, data)
+        enrollment.save(update_fields=['data'])
+    except Enrollment.DoesNotExist:
+        enrollment = Enrollment.objects.create(user=data['user'], data=data)
+    enrollment.confirmation_code = ingest.new_confirmation_code(data['user'])
+    enrollment.save(update_fields=['confirmation_code'])
+
+
+class Command(BaseCommand):
+    help = (
+        "Submit enrollments for a few users from many threads at once and report throughput, "
+        "latency, errors and lost updates. Writes benchmark-user-* rows and removes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5, help='Distinct users (fewer users = more contention)')
+        parser.add_argument('--submissions', type=int, default=40, help='Submissions per user')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writers')
+        parser.add_argument('--unlocked', action='store_true', help='Use the previous read-merge-save path')
+
+    def handle(self, *args, **options):
+        users = [f'{USER_PREFIX}{i}' for i in range(max(options['users'], 1))]
+        submissions = max(options['submissions'], 1)
+        write = unlocked_upsert if options['unlocked'] else ingest.upsert
+        # every submission adds its own key, so a lost update shows up as a missing key
+        payloads = [
+            {'user': user, f'field_{n}': n + 1}
+            for n in range(submissions) for user in users
+        ]
+
+        self._cleanup()
+        errors = []
+        opened = []
+        lock = threading.Lock()
+
+        def submit(payload):
+            if not getattr(connection, '_benchmark_seen', False):
+                connection._benchmark_seen = True
+                with lock:
+                    opened.append(connection)
+            started = time.perf_counter()
+            try:
+                write(payload)
+            except Exception as e:
+                errors.append(f'{type(e).__name__}: {e}')
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(options['threads'], 1)) as executor:
+            latencies = sorted(executor.map(submit, payloads))
+        elapsed = time.perf_counter() - started
+        for conn in opened:
+            conn.close()
+
+        stored = dict(Enrollment.objects.filter(user__in=users).values_list('user', 'data'))
+        lost = sum(
+            1 for user in users for n in range(submissions)
+            if f'field_{n}' not in stored.get(user, {})
+        )
+
+        self.stdout.write(f"Database: {connections['default'].vendor}, path: {'unlocked' if options['unlocked'] else 'locked upsert'}")
+        self.stdout.write(
+            f"{len(payloads)} submissions for {len(users)} users on {options['threads']} threads: "
+            f"{len(payloads) / elapsed:.0f}/s, mean {statistics.mean(latencies):.2f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms"
+        )
+        self.stdout.write(f"Errors: {len(errors)}" + (f" (first: {errors[0]})" if errors else ''))
+        style = self.style.ERROR if lost else self.style.SUCCESS
+        self.stdout.write(style(f"Lost updates: {lost} of {len(payloads) - len(errors)} accepted submissions"))
+        self._cleanup()
+
+    def _cleanup(self):
+        if Enrollment.objects.filter(user__startswith=USER_PREFIX).exists():
+            Enrollment.objects.filter(user__startswith=USER_PREFIX).delete()
+            key_index.rebuild()
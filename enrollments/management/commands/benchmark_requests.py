@@ -0,0 +1,100 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+
+
+DEFAULT_PATHS = ['/exists/?username=Example', '/profile/batch/?username=Example']
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    Serves requests on a fixed set of threads, like uWSGI workers, so
+    per-thread database connections can be reused between requests.
+    """
+    pool = None
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure request latency through a real WSGI server, so connection reuse counts. "
+        "Compare runs with and without the tuning profile, e.g. DB_TUNING=0."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths', help='Path to request (repeatable)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per path')
+        parser.add_argument('--concurrency', type=int, default=4, help='Parallel clients')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or DEFAULT_PATHS
+        total = max(options['requests'], 1)
+        concurrency = max(options['concurrency'], 1)
+
+        database = settings.DATABASES['default']
+        self.stdout.write(f"Database: {connection.vendor}, CONN_MAX_AGE={database.get('CONN_MAX_AGE', 0)}, "
+                          f"CONN_HEALTH_CHECKS={database.get('CONN_HEALTH_CHECKS', False)}")
+        if connection.vendor == 'sqlite':
+            self.stdout.write(f"SQLite pragmas: {getattr(settings, 'SQLITE_PRAGMAS', {}) or 'none'}")
+
+        server = make_server('127.0.0.1', 0, get_wsgi_application(),
+                             server_class=PooledWSGIServer, handler_class=QuietHandler)
+        server.pool = ThreadPoolExecutor(max_workers=concurrency)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else '127.0.0.1'
+
+        local = threading.local()
+
+        def timed_get(path):
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+            started = time.perf_counter()
+            response = local.session.get(base_url + path, headers={'Host': host})
+            return (time.perf_counter() - started) * 1000, response.status_code
+
+        try:
+            for path in paths:
+                timed_get(path)  # warm up
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    results = list(executor.map(timed_get, [path] * total))
+                elapsed = time.perf_counter() - started
+
+                latencies = sorted(latency for latency, status in results)
+                statuses = sorted({status for latency, status in results})
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n{path}"))
+                self.stdout.write(
+                    f"  {total} requests, {concurrency} clients, status {statuses}: "
+                    f"mean {statistics.mean(latencies):.2f} ms, "
+                    f"p50 {latencies[len(latencies) // 2]:.2f} ms, "
+                    f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, "
+                    f"{total / elapsed:.0f} req/s"
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.pool.shutdown()
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from enrollments.models import Enrollment, Profile, UserBadge
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the query plan and mean run time of the hot lookups. Run it before and "
+        "after a schema migration to compare, e.g. with `migrate enrollments 0011`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per query for the timing')
+        parser.add_argument('--username', default='Example', help='Username the lookups filter on')
+
+    def lookups(self, username):
+        badge_id = UserBadge.objects.values_list('badge_id', flat=True).first() or 0
+        return [
+            ('profile by username', Profile.objects.filter(username=username)),
+            ('enrollment legacy flag', Enrollment.objects.annotate(
+                legacy=Exists(Profile.objects.filter(username=OuterRef('user'))),
+            ).filter(user=username)),
+            ('profiles without enrollment', Profile.objects.exclude(username__in=Enrollment.objects.values('user'))[:100]),
+            ('badges of a user', UserBadge.objects.filter(user=username).select_related('badge').order_by('-issued_at')),
+            ('awards of a badge', UserBadge.objects.filter(badge_id=badge_id).order_by('-issued_at', '-id')[:50]),
+        ]
+
+    def handle(self, *args, **options):
+        repeat = max(options['repeat'], 1)
+        self.stdout.write(f"Database: {connection.vendor}")
+        for name, queryset in self.lookups(options['username']):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / repeat
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}: {elapsed * 1000:.3f} ms"))
+            self.stdout.write(queryset.explain())
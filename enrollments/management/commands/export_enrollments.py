@@ -0,0 +1,27 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from enrollments import exports
+
+
+class Command(BaseCommand):
+    help = "Export every enrollment (and profiles that never enrolled) as CSV, JSONL or XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv', help='Output format')
+        parser.add_argument('--output', type=str, help='Output file (defaults to stdout)')
+        parser.add_argument('--query', type=str, default='', help='Only export rows matching this text')
+
+    def handle(self, *args, **options):
+        output = options.get('output')
+        fh = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in exports.stream(options['format'], options['query']):
+                fh.write(chunk)
+        finally:
+            if output:
+                fh.close()
+
+        if output:
+            self.stderr.write(self.style.SUCCESS(f"Exported enrollments to {output}"))
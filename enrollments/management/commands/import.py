@@ -1,29 +1,191 @@
+import codecs
 import json
-from django.core.management.base import BaseCommand
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from enrollments import username_search
 from enrollments.models import Profile
 
+# Profile field -> default when the record does not have it
+IMPORTED_FIELDS = {
+    'username_org': '',
+    'reconciled_affiliation': '',
+    'reconciled_territory': '',
+    'reconciled_languages': None,
+    'reconciled_projects': None,
+    'reconciled_want_to_learn': None,
+    'reconciled_want_to_share': None,
+}
+
+READ_SIZE = 64 * 1024
+
+
+def detect_format(path):
+    """
+    'array' if the file holds one JSON array, 'jsonl' for one object per line.
+    """
+    with open(path, 'rb') as fh:
+        while True:
+            chunk = fh.read(READ_SIZE)
+            if not chunk:
+                return 'jsonl'
+            stripped = chunk.lstrip(b'\xef\xbb\xbf \t\r\n')
+            if stripped:
+                return 'array' if stripped[:1] == b'[' else 'jsonl'
+
+
+def iter_jsonl(fh):
+    """
+    Yield ``(record, end_offset)`` for every line of an open binary file.
+    """
+    offset = fh.tell()
+    for line in fh:
+        offset += len(line)
+        if line.strip():
+            yield json.loads(line), offset
+
+
+def iter_json_array(fh):
+    """
+    Yield ``(record, end_offset)`` for every element of a JSON array, reading
+    the open binary file in chunks. The file may be positioned at the start
+    of the array or right after any element (a previous ``end_offset``).
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    if fh.tell() == 0 and fh.read(3) != codecs.BOM_UTF8:
+        fh.seek(0)
+    offset = fh.tell()
+    buffer = ''
+    eof = False
+    while True:
+        # skip the separators between elements
+        position = 0
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[':
+            position += 1
+        if position:
+            offset += len(buffer[:position].encode('utf-8'))
+            buffer = buffer[position:]
+        if buffer.startswith(']'):
+            return
+
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                if buffer:
+                    raise CommandError(f"Invalid JSON near byte {offset}")
+                return
+            chunk = fh.read(READ_SIZE)
+            eof = not chunk
+            buffer += utf8.decode(chunk, final=eof)
+            continue
+
+        # a number cut at the chunk boundary parses fine, so make sure it ended
+        if end == len(buffer) and not eof:
+            chunk = fh.read(READ_SIZE)
+            eof = not chunk
+            buffer += utf8.decode(chunk, final=eof)
+            continue
+
+        offset += len(buffer[:end].encode('utf-8'))
+        buffer = buffer[end:]
+        yield record, offset
+
+
 class Command(BaseCommand):
+    help = "Import (upsert on username) reconciled profiles from a JSON array or JSONL file."
 
     def add_arguments(self, parser):
         parser.add_argument('json_file', type=str, help='Path to the JSON file containing profiles data')
+        parser.add_argument('--format', choices=['auto', 'array', 'jsonl'], default='auto',
+                            help='Input layout (default: detected from the first character)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Profiles written per transaction')
+        parser.add_argument('--offset', type=int, default=None, help='Byte offset to resume reading from')
+        parser.add_argument('--checkpoint', type=str, default=None,
+                            help='File recording the offset after each committed batch; resumes from it if '
+                                 'present and is removed once the import completes')
 
     def handle(self, *args, **options):
         json_file_path = options['json_file']
+        if not os.path.isfile(json_file_path):
+            raise CommandError(f"File not found: {json_file_path}")
+
+        input_format = options['format']
+        if input_format == 'auto':
+            input_format = detect_format(json_file_path)
+
+        checkpoint = options['checkpoint']
+        offset = options['offset']
+        resumed = False
+        if offset is None and checkpoint and os.path.isfile(checkpoint):
+            with open(checkpoint, 'r', encoding='utf-8') as fh:
+                offset = int(fh.read().strip() or 0)
+            resumed = True
+        offset = offset or 0
+        if offset:
+            self.stdout.write(f"Resuming at byte {offset}")
+
+        batch_size = max(options['batch_size'], 1)
+        started = time.monotonic()
+        imported = 0
+        skipped = 0
+
+        with open(json_file_path, 'rb') as fh:
+            fh.seek(offset)
+            records = iter_json_array(fh) if input_format == 'array' else iter_jsonl(fh)
+            batch = {}
+            end_offset = offset
+            for profile_data, end_offset in records:
+                username = profile_data.get('username') if isinstance(profile_data, dict) else None
+                if not username:
+                    skipped += 1
+                    continue
+                batch[username] = profile_data
+                if len(batch) >= batch_size:
+                    imported += self._write_batch(batch, end_offset, checkpoint, started, imported)
+                    batch = {}
+            if batch:
+                imported += self._write_batch(batch, end_offset, checkpoint, started, imported)
+
+        if resumed and not imported and not skipped:
+            self.stderr.write(f"Nothing left to import after the offset in {checkpoint}; that run had already completed")
+        if checkpoint and os.path.isfile(checkpoint):
+            # done, so the next run with this checkpoint starts from the beginning
+            os.remove(checkpoint)
+
+        elapsed = time.monotonic() - started
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Profiles imported successfully! {imported} upserted, {skipped} skipped without username "
+            f"in {elapsed:.1f}s ({rate:.0f} rows/s)"
+        ))
+
+    def _write_batch(self, batch, end_offset, checkpoint, started, imported_so_far):
+        """
+        Upsert one batch in its own transaction, then record ``end_offset``
+        as the place to resume from.
+        """
+        profiles = [
+            Profile(username=username, **{field: data.get(field, default) for field, default in IMPORTED_FIELDS.items()})
+            for username, data in batch.items()
+        ]
+        kwargs = {'update_conflicts': True, 'update_fields': list(IMPORTED_FIELDS)}
+        if connection.features.supports_update_conflicts_with_target:
+            kwargs['unique_fields'] = ['username']
+        with transaction.atomic():
+            Profile.objects.bulk_create(profiles, **kwargs)
+            # bulk_create sends no post_save, keep the autocomplete index in sync by hand
+            username_search.register(list(batch), 'profile')
+
+        if checkpoint:
+            with open(checkpoint, 'w', encoding='utf-8') as fh:
+                fh.write(str(end_offset))
 
-        with open(json_file_path, 'r', encoding='utf-8') as file:
-            profiles_data = json.load(file)
-
-        # Import data into the database
-        for profile_data in profiles_data:
-            Profile.objects.create(
-                username=profile_data.get('username', ''),
-                username_org=profile_data.get('username_org', ''),
-                reconciled_affiliation=profile_data.get('reconciled_affiliation', ''),
-                reconciled_territory=profile_data.get('reconciled_territory', ''),
-                reconciled_languages=profile_data.get('reconciled_languages', None),
-                reconciled_projects=profile_data.get('reconciled_projects', None),
-                reconciled_want_to_learn=profile_data.get('reconciled_want_to_learn', None),
-                reconciled_want_to_share=profile_data.get('reconciled_want_to_share', None)
-            )
-
-        print("Profiles imported successfully!")
\ No newline at end of file
+        imported = imported_so_far + len(profiles)
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"  {imported} rows, offset {end_offset} ({imported / elapsed if elapsed else 0:.0f} rows/s)")
+        return len(profiles)
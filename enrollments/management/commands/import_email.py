@@ -1,30 +1,85 @@
 import csv
+import time
+from itertools import islice
+
 from django.core.management.base import BaseCommand
+
 from enrollments.models import Profile
 
+# CSV column -> Profile field
+COLUMNS = {'email': 'email', 'name': 'full_name'}
+
+
 class Command(BaseCommand):
+    help = "Backfill Profile email and full name from a CSV with username, email and name columns."
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file containing user email data')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='CSV rows handled per query and bulk update')
+        parser.add_argument('--unmatched-file', type=str, default=None,
+                            help='Where to list usernames without a profile (default: <csv_file>.unmatched.txt)')
 
     def handle(self, *args, **options):
         csv_file_path = options['csv_file']
+        unmatched_path = options['unmatched_file'] or f"{csv_file_path}.unmatched.txt"
+        chunk_size = max(options['chunk_size'], 1)
+        started = time.monotonic()
+        totals = {'rows': 0, 'updated': 0, 'unchanged': 0, 'unmatched': 0}
 
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
+        with open(csv_file_path, 'r', encoding='utf-8') as file, \
+                open(unmatched_path, 'w', encoding='utf-8') as unmatched_file:
             profiles_data = csv.DictReader(file)
+            while True:
+                chunk = list(islice(profiles_data, chunk_size))
+                if not chunk:
+                    break
+                totals['rows'] += len(chunk)
+                updated, unchanged, unmatched = self._apply_chunk(chunk)
+                totals['updated'] += updated
+                totals['unchanged'] += unchanged
+                totals['unmatched'] += len(unmatched)
+                for username in unmatched:
+                    unmatched_file.write(username + '\n')
+                self.stdout.write(f"  {totals['rows']} rows read, {totals['updated']} profiles updated")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {totals['updated']} profiles, {totals['unchanged']} already up to date "
+            f"({totals['rows']} rows in {elapsed:.1f}s)"
+        ))
+        if totals['unmatched']:
+            self.stdout.write(self.style.WARNING(
+                f"{totals['unmatched']} usernames without a profile, listed in {unmatched_path}"
+            ))
+
+    def _apply_chunk(self, chunk):
+        """
+        Update the profiles named in one chunk of CSV rows with a single
+        SELECT and a single bulk UPDATE. Returns (updated, unchanged, unmatched).
+        """
+        # later rows win, as they did when every row was saved in turn
+        wanted = {}
+        for row in chunk:
+            username = row.get('username')
+            if username:
+                wanted[username] = {field: row.get(column) for column, field in COLUMNS.items()}
+
+        profiles = Profile.objects.filter(username__in=wanted).only('id', 'username', *COLUMNS.values())
+        found = {profile.username: profile for profile in profiles}
+
+        changed = []
+        for username, values in wanted.items():
+            profile = found.get(username)
+            if profile is None:
+                continue
+            if any(getattr(profile, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(profile, field, value)
+                changed.append(profile)
+
+        if changed:
+            # bulk_update runs in its own transaction
+            Profile.objects.bulk_update(changed, list(COLUMNS.values()))
 
-            # Import data into the database
-            for profile_data in profiles_data:
-                username = profile_data.get('username')
-                email = profile_data.get('email')
-                full_name = profile_data.get('name')
-
-                if username:
-                    profile = Profile.objects.filter(username=username).first()
-                    if profile:
-                        profile.email = email
-                        profile.full_name = full_name
-                        profile.save()
-                        self.stdout.write(self.style.SUCCESS(f"Updated profile for {username}"))
-                    else:
-                        self.stdout.write(self.style.WARNING(f"Profile for {username} not found"))
+        unmatched = [username for username in wanted if username not in found]
+        return len(changed), len(found) - len(changed), unmatched
@@ -1,17 +1,12 @@
 import os
-import sys
-import uuid
-import hashlib
+import time
 from typing import List, Tuple
 
 from django.core.management.base import BaseCommand, CommandError
-from django.utils import timezone
+from django.db import transaction
 
-from enrollments.models import Badge, UserBadge, Profile
-
-
-def field_exists(model, field_name: str) -> bool:
-    return any(f.name == field_name for f in model._meta.get_fields())
+from enrollments import badge_cache, username_search, verification_codes
+from enrollments.models import Badge, UserBadge
 
 
 class Command(BaseCommand):
@@ -21,6 +16,8 @@ class Command(BaseCommand):
         parser.add_argument('--badge-id', type=int, help='ID of the badge to award')
         parser.add_argument('--file', type=str, help='Path to a text file with one username per line (optional)')
         parser.add_argument('--yes', action='store_true', help='Skip confirmation prompt')
+        parser.add_argument('--batch-size', type=int, default=500, help='Awards written per INSERT (default: 500)')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be awarded without writing')
 
     def handle(self, *args, **options):
         badge = self._select_badge(options.get('badge_id'))
@@ -39,20 +36,23 @@ class Command(BaseCommand):
         self.stdout.write(self.style.NOTICE(f"Badge: {badge.id} - {badge.name}"))
         self.stdout.write(self.style.NOTICE(f"Users to award: {len(usernames)} (unique)"))
 
-        if not options.get('yes') and not self._confirm("Proceed with awarding?"):
+        dry_run = options.get('dry_run')
+        if not dry_run and not options.get('yes') and not self._confirm("Proceed with awarding?"):
             self.stdout.write(self.style.WARNING("Aborted."))
             return
 
-        created, skipped, errors = self._award_many(badge, usernames)
+        batch_size = max(options.get('batch_size') or 500, 1)
+        created, skipped = self._award_many(badge, usernames, batch_size, dry_run)
 
         self.stdout.write("")
-        self.stdout.write(self.style.SUCCESS(f"Created: {len(created)} awards"))
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Would create: {len(created)} awards (dry run, nothing written)"))
+            for u in created:
+                self.stdout.write(f"  + {u}")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Created: {len(created)} awards"))
         if skipped:
             self.stdout.write(self.style.WARNING(f"Skipped (already awarded): {len(skipped)}"))
-        if errors:
-            self.stdout.write(self.style.ERROR(f"Errors: {len(errors)}"))
-            for u, err in errors:
-                self.stdout.write(self.style.ERROR(f"  - {u}: {err}"))
 
     # --- helpers ---
     def _select_badge(self, badge_id: int | None) -> Badge:
@@ -117,42 +117,35 @@ class Command(BaseCommand):
                 users.append(u)
         return users
 
-    def _award_many(self, badge: Badge, usernames: List[str]) -> Tuple[List[str], List[str], List[tuple]]:
-        created: List[str] = []
-        skipped: List[str] = []
-        errors: List[tuple] = []
-
-        has_ver_code = field_exists(UserBadge, 'verification_code')
-        has_issued_at = field_exists(UserBadge, 'issued_at')
-
-        for username in usernames:
-            try:
-                # Skip duplicates
-                if UserBadge.objects.filter(user=username, badge=badge).exists():
-                    skipped.append(username)
-                    continue
-
-                create_kwargs = {
-                    'user': username,
-                    'badge': badge,
-                }
-                if has_ver_code:
-                    create_kwargs['verification_code'] = hashlib.sha256(
-                        f"{badge.id}:{username}:{uuid.uuid4()}".encode()
-                    ).hexdigest()[:64]
-
-                ub = UserBadge.objects.create(**create_kwargs)
-                if has_issued_at:
-                    # Only set if model supports it and wasn't set automatically
-                    if getattr(ub, 'issued_at', None) is None:
-                        ub.issued_at = timezone.now()
-                        ub.save(update_fields=['issued_at'])
-
-                created.append(username)
-            except Exception as e:
-                errors.append((username, str(e)))
-
-        return created, skipped, errors
+    def _award_many(self, badge: Badge, usernames: List[str], batch_size: int = 500,
+                    dry_run: bool = False) -> Tuple[List[str], List[str]]:
+        # One query for everyone who already has the badge
+        awarded = set(UserBadge.objects.filter(badge=badge).values_list('user', flat=True))
+        skipped = [u for u in usernames if u in awarded]
+        pending = [u for u in usernames if u not in awarded]
+        if dry_run or not pending:
+            return pending, skipped
+
+        started = time.monotonic()
+        done = 0
+        # All or nothing: a failure rolls back every batch
+        with transaction.atomic():
+            for i in range(0, len(pending), batch_size):
+                batch = pending[i:i + batch_size]
+                codes = verification_codes.generate(len(batch))
+                UserBadge.objects.bulk_create(
+                    [UserBadge(user=u, badge=badge, verification_code=code) for u, code in zip(batch, codes)]
+                )
+                done += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"  {done}/{len(pending)} awarded ({done / elapsed if elapsed else 0:.0f}/s)")
+            # bulk_create sends no post_save, keep the autocomplete index and API cache in sync by hand
+            username_search.register(pending, 'badge')
+        badge_cache.invalidate_users(pending)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"Wrote {done} awards in {elapsed:.2f}s ({done / elapsed if elapsed else 0:.0f}/s)")
+        return pending, skipped
 
     def _confirm(self, prompt: str) -> bool:
         ans = input(f"{prompt} [y/N]: ").strip().lower()
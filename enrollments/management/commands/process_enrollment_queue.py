@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from enrollments import ingest_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply enrollment submissions queued by the webhook in queued ingestion mode. "
+        "Runs until stopped unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Submissions per transaction (ENROLLMENT_INGEST BATCH_SIZE)')
+        parser.add_argument('--interval', type=float, default=None, help='Seconds to wait when the queue is empty (ENROLLMENT_INGEST POLL_INTERVAL)')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--stats', action='store_true', help='Only print the queue depth and lag')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+
+        config = ingest_queue.get_config()
+        batch_size = max(options['batch_size'] or config['BATCH_SIZE'], 1)
+        interval = options['interval'] if options['interval'] is not None else config['POLL_INTERVAL']
+        if not config['QUEUED']:
+            self.stderr.write("ENROLLMENT_INGEST QUEUED is off; the webhook is not queueing new submissions")
+
+        def report(count, enrollments):
+            elapsed = time.perf_counter() - started[0]
+            figures = ingest_queue.stats()
+            self.stdout.write(
+                f"Applied {count} submissions to {enrollments} enrollments in {elapsed * 1000:.0f} ms; "
+                f"depth {figures['depth']}, lag {figures['lag_seconds']:.1f} s"
+            )
+            started[0] = time.perf_counter()
+
+        total = 0
+        try:
+            while True:
+                started = [time.perf_counter()]
+                total += ingest_queue.drain(batch_size, on_batch=report)
+                if options['once']:
+                    break
+                # keep a long-running worker off stale or broken connections
+                close_old_connections()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Applied {total} queued submissions"))
+
+    def print_stats(self):
+        figures = ingest_queue.stats()
+        self.stdout.write(f"Queued mode: {'on' if figures['queued_mode'] else 'off'}")
+        self.stdout.write(f"Depth: {figures['depth']}")
+        self.stdout.write(f"Oldest: {figures['oldest'] or '-'}")
+        self.stdout.write(f"Lag: {figures['lag_seconds']:.1f} s")
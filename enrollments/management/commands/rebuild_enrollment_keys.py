@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from enrollments import key_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the enrollment data key index from every Enrollment."
+
+    def handle(self, *args, **options):
+        count = key_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} keys"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from enrollments import username_search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the username autocomplete table from Profile, Enrollment and UserBadge."
+
+    def handle(self, *args, **options):
+        count = username_search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} usernames"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from enrollments import verification_codes
+
+
+class Command(BaseCommand):
+    help = "Report how much of the badge verification-code keyspace is in use."
+
+    def handle(self, *args, **options):
+        stats = verification_codes.stats()
+        self.stdout.write(f"Alphabet: {stats['alphabet']} ({len(stats['alphabet'])} symbols), length {stats['length']}")
+        self.stdout.write(f"Keyspace: {stats['keyspace']:,}")
+        self.stdout.write(f"Issued: {stats['issued']:,} ({stats['usage']:.2e} of the keyspace)")
+        self.stdout.write(f"Expected draws per code: {1 / (1 - stats['usage']):.6f}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from enrollments import capacity_labels
+from enrollments.http_client import UpstreamError
+
+
+class Command(BaseCommand):
+    help = "Pre-warm the capacity label cache with the whole capacity vocabulary from metabase."
+
+    def handle(self, *args, **options):
+        try:
+            results = capacity_labels.query_labels()
+        except UpstreamError as e:
+            raise CommandError(f"Could not fetch capacity labels: {e}")
+
+        capacity_labels.store(results)
+        self.stdout.write(self.style.SUCCESS(f"Stored {len(results)} capacity labels"))
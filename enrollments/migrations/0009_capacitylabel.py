@@ -0,0 +1,24 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0008_alter_userbadge_verification_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapacityLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qid', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('item', models.URLField(blank=True, max_length=255)),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
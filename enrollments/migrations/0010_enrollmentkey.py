@@ -0,0 +1,55 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:06
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def populate_enrollment_keys(apps, schema_editor):
+    from enrollments.key_index import value_type
+
+    enrollment = apps.get_model('enrollments', 'Enrollment')
+    enrollment_key = apps.get_model('enrollments', 'EnrollmentKey')
+    stats = {}
+    for timestamp, data in enrollment.objects.values_list('timestamp', 'data').iterator(chunk_size=2000):
+        for name, value in (data or {}).items():
+            entry = stats.setdefault(name, {'first_seen': timestamp, 'last_seen': timestamp, 'occurrences': 0, 'types': set()})
+            entry['first_seen'] = min(entry['first_seen'], timestamp)
+            entry['last_seen'] = max(entry['last_seen'], timestamp)
+            entry['occurrences'] += 1
+            entry['types'].add(value_type(value))
+
+    enrollment_key.objects.bulk_create([
+        enrollment_key(
+            name=name,
+            first_seen=entry['first_seen'],
+            last_seen=entry['last_seen'],
+            occurrences=entry['occurrences'],
+            value_types=sorted(entry['types']),
+        )
+        for name, entry in stats.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0009_capacitylabel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnrollmentKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('occurrences', models.PositiveIntegerField(default=0)),
+                ('value_types', models.JSONField(blank=True, default=list)),
+            ],
+        ),
+        migrations.RunPython(
+            populate_enrollment_keys,
+            reverse_code=migrations.RunPython.noop
+        ),
+    ]
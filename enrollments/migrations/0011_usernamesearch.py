@@ -0,0 +1,87 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:08
+
+from django.db import DatabaseError, migrations, models
+
+
+FTS_TABLE = 'enrollments_usernamesearch_fts'
+FULLTEXT_INDEX = 'enrollments_usernamesearch_ngram'
+
+SQLITE_FTS = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "normalized, content='enrollments_usernamesearch', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON enrollments_usernamesearch BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, normalized) VALUES (new.id, new.normalized); END",
+    f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON enrollments_usernamesearch BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, normalized) VALUES ('delete', old.id, old.normalized); END",
+    f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF normalized ON enrollments_usernamesearch BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, normalized) VALUES ('delete', old.id, old.normalized); "
+    f"INSERT INTO {FTS_TABLE}(rowid, normalized) VALUES (new.id, new.normalized); END",
+]
+
+
+def create_substring_index(apps, schema_editor):
+    """
+    FTS5 trigram table on SQLite, ngram FULLTEXT index on MySQL. Skipped when
+    the database does not support them; searches then fall back to LIKE.
+    """
+    vendor = schema_editor.connection.vendor
+    try:
+        if vendor == 'sqlite':
+            for statement in SQLITE_FTS:
+                schema_editor.execute(statement)
+        elif vendor == 'mysql':
+            schema_editor.execute(
+                f"ALTER TABLE enrollments_usernamesearch ADD FULLTEXT INDEX {FULLTEXT_INDEX} (normalized) WITH PARSER ngram"
+            )
+    except DatabaseError:
+        pass
+
+
+def drop_substring_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def populate_usernames(apps, schema_editor):
+    from enrollments.username_search import search_key
+
+    username_search = apps.get_model('enrollments', 'UsernameSearch')
+    sources = (
+        ('has_profile', apps.get_model('enrollments', 'Profile'), 'username'),
+        ('has_enrollment', apps.get_model('enrollments', 'Enrollment'), 'user'),
+        ('has_badge', apps.get_model('enrollments', 'UserBadge'), 'user'),
+    )
+    rows = {}
+    for flag, model, field in sources:
+        for username in model.objects.values_list(field, flat=True).distinct().iterator(chunk_size=2000):
+            if not username:
+                continue
+            row = rows.setdefault(username, username_search(username=username, normalized=search_key(username)))
+            setattr(row, flag, True)
+    username_search.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0010_enrollmentkey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsernameSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=255, unique=True)),
+                ('normalized', models.CharField(db_index=True, max_length=255)),
+                ('has_profile', models.BooleanField(default=False)),
+                ('has_enrollment', models.BooleanField(default=False)),
+                ('has_badge', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.RunPython(create_substring_index, reverse_code=drop_substring_index),
+        migrations.RunPython(populate_usernames, reverse_code=migrations.RunPython.noop),
+    ]
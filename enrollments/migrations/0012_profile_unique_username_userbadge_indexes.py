@@ -0,0 +1,57 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:09
+
+from django.db import migrations, models
+from django.db.models import Count
+
+PROFILE_FIELDS = [
+    'username_org', 'reconciled_affiliation', 'reconciled_territory', 'reconciled_languages',
+    'reconciled_projects', 'reconciled_want_to_learn', 'reconciled_want_to_share', 'full_name', 'email',
+]
+
+
+def dedupe_profiles(apps, schema_editor):
+    # Keep the oldest row per username, give every field the newest non-empty
+    # value of any duplicate (the imports only ever add rows, so the newest
+    # row holds the latest data) and delete the rest.
+    profile = apps.get_model('enrollments', 'Profile')
+    duplicated = (
+        profile.objects.values('username')
+        .annotate(rows=Count('id'))
+        .filter(rows__gt=1)
+        .values_list('username', flat=True)
+    )
+    for username in list(duplicated):
+        rows = list(profile.objects.filter(username=username).order_by('id'))
+        kept, duplicates = rows[0], rows[1:]
+        for field in PROFILE_FIELDS:
+            for row in reversed(rows):
+                if getattr(row, field) not in (None, '', []):
+                    setattr(kept, field, getattr(row, field))
+                    break
+        kept.save()
+        profile.objects.filter(id__in=[d.id for d in duplicates]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0011_usernamesearch'),
+    ]
+
+    operations = [
+        # the deleted duplicates cannot be restored, so this is irreversible
+        migrations.RunPython(dedupe_profiles),
+        migrations.AlterField(
+            model_name='profile',
+            name='username',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='userbadge',
+            index=models.Index(fields=['user', '-issued_at'], name='userbadge_user_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbadge',
+            index=models.Index(fields=['badge', '-issued_at', '-id'], name='userbadge_badge_issued_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+import secrets
+import string
+
+from django.db import migrations
+from django.db.models.functions import Length
+
+
+def shorten_verification_codes(apps, schema_editor):
+    # mass_award used to store 64-char hashes, which only SQLite accepted in
+    # the 10-char column. Keep their last 10 chars, as 0008 did, unless taken.
+    userbadge = apps.get_model('enrollments', 'UserBadge')
+    alphabet = string.ascii_lowercase + string.digits
+    long_codes = list(userbadge.objects.annotate(code_length=Length('verification_code')).filter(code_length__gt=10))
+    taken = set(
+        userbadge.objects.annotate(code_length=Length('verification_code'))
+        .filter(code_length__lte=10)
+        .values_list('verification_code', flat=True)
+    )
+    for badge in long_codes:
+        code = badge.verification_code[-10:]
+        while code in taken:
+            code = ''.join(secrets.choice(alphabet) for _ in range(10))
+        taken.add(code)
+        badge.verification_code = code
+        badge.save(update_fields=['verification_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0012_profile_unique_username_userbadge_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            shorten_verification_codes,
+            reverse_code=migrations.RunPython.noop
+        ),
+    ]
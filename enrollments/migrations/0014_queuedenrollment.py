@@ -0,0 +1,24 @@
+# Generated by Django 4.2.11 on 2026-10-18 12:25
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('enrollments', '0013_shorten_long_verification_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedEnrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.CharField(max_length=255)),
+                ('data', models.JSONField()),
+                ('confirmation_code', models.CharField(max_length=64)),
+                ('received_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
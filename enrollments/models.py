@@ -13,7 +13,7 @@ class Enrollment(models.Model):
     confirmation_code = models.CharField(max_length=64, blank=True, null=True)
 
 class Profile(models.Model):
-    username = models.CharField(max_length=255)
+    username = models.CharField(max_length=255, unique=True)
     username_org = models.CharField(max_length=255, blank=True, null=True)
     reconciled_affiliation = models.CharField(max_length=255, blank=True, null=True)
     reconciled_territory = models.CharField(max_length=255, blank=True, null=True)
@@ -47,6 +47,68 @@ class UserBadge(models.Model):
 
     class Meta:
         unique_together = ('user', 'badge')
+        indexes = [
+            # /user-badges/ lists a user's badges newest first
+            models.Index(fields=['user', '-issued_at'], name='userbadge_user_issued_idx'),
+            # badge award lists and previews, newest first
+            models.Index(fields=['badge', '-issued_at', '-id'], name='userbadge_badge_issued_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user} - {self.badge}"
\ No newline at end of file
+        return f"{self.user} - {self.badge}"
+
+class CapacityLabel(models.Model):
+    """
+    Cached English label of a capacity QID, as resolved through the metabase SPARQL
+    endpoint. An empty name records that the endpoint had no label for the QID.
+    """
+    qid = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    item = models.URLField(max_length=255, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.qid} - {self.name}"
+
+
+class EnrollmentKey(models.Model):
+    """
+    Registry of the keys seen in Enrollment.data, kept up to date as enrollments are received.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
+    occurrences = models.PositiveIntegerField(default=0)
+    value_types = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class UsernameSearch(models.Model):
+    """
+    Every username known from Profile, Enrollment or UserBadge, with a normalized
+    form for autocomplete. Kept in sync by enrollments.username_search.
+    """
+    username = models.CharField(max_length=255, unique=True)
+    normalized = models.CharField(max_length=255, db_index=True)
+    has_profile = models.BooleanField(default=False)
+    has_enrollment = models.BooleanField(default=False)
+    has_badge = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.username
+
+
+class QueuedEnrollment(models.Model):
+    """
+    Verified webhook submission waiting to be applied by process_enrollment_queue
+    (queued ingestion, see enrollments.ingest_queue). Rows are deleted once applied.
+    """
+    user = models.CharField(max_length=255)
+    data = models.JSONField()
+    confirmation_code = models.CharField(max_length=64)
+    received_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.user} ({self.received_at})"
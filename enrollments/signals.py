@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from enrollments import badge_cache, username_search
+from enrollments.models import Badge, Enrollment, Profile, UserBadge
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    # settings.SQLITE_PRAGMAS comes from settings_env.configure_database_tuning
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, **kwargs):
+    username_search.register([instance.username], 'profile')
+
+
+@receiver(post_delete, sender=Profile)
+def profile_deleted(sender, instance, **kwargs):
+    username_search.unregister([instance.username], 'profile')
+
+
+@receiver(post_save, sender=Enrollment)
+def enrollment_saved(sender, instance, **kwargs):
+    username_search.register([instance.user], 'enrollment')
+
+
+@receiver(post_delete, sender=Enrollment)
+def enrollment_deleted(sender, instance, **kwargs):
+    username_search.unregister([instance.user], 'enrollment')
+
+
+@receiver(post_save, sender=UserBadge)
+def userbadge_saved(sender, instance, **kwargs):
+    username_search.register([instance.user], 'badge')
+    badge_cache.invalidate_users([instance.user])
+    badge_cache.invalidate_certificates([instance.verification_code])
+
+
+@receiver(post_delete, sender=UserBadge)
+def userbadge_deleted(sender, instance, **kwargs):
+    # also sent for every award when a badge is deleted (cascade)
+    username_search.unregister([instance.user], 'badge')
+    badge_cache.invalidate_users([instance.user])
+    badge_cache.invalidate_certificates([instance.verification_code])
+
+
+@receiver(post_save, sender=Badge)
+def badge_saved(sender, instance, created, **kwargs):
+    if not created:
+        awards = list(instance.awarded_users.values_list('user', 'verification_code'))
+        badge_cache.invalidate_users(user for user, code in awards)
+        badge_cache.invalidate_certificates(code for user, code in awards)
@@ -0,0 +1,147 @@
+"""
+Request coalescing ("single flight") for the upstream calls of the proxy.
+
+Concurrent calls of ``run(key, fetch)`` with the same key share one
+``fetch()``:
+
+* within a process, the first caller fetches and every other caller
+  (on any thread or event loop) waits for its outcome;
+* across processes, the fetching caller holds ``single-flight-lock:<key>``
+  in the default cache and publishes its outcome for ``RESULT_TTL``
+  seconds; callers in other processes poll for it instead of fetching.
+
+Upstream errors are shared the same way, so a failing upstream is not hit
+once per waiting request. A caller never waits longer than
+``WAIT_TIMEOUT`` seconds before fetching on its own. ``fetch`` must return
+something the cache can pickle. Settings come from
+``settings.PROXY_SINGLE_FLIGHT`` (see ``DEFAULTS``).
+"""
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import cache
+
+from enrollments.http_client import UpstreamError
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    # longer than an upstream call can take (connect + read timeouts and retries)
+    'LOCK_TIMEOUT': 60,
+    'RESULT_TTL': 2,
+    'POLL_INTERVAL': 0.05,
+    'WAIT_TIMEOUT': 30,
+}
+
+_in_flight = {}
+_lock = threading.Lock()
+_counters = {'fetched': 0, 'joined': 0, 'shared': 0, 'timed_out': 0}
+
+
+class LeaderGone(Exception):
+    """
+    The caller that was fetching for a key gave up (e.g. its request was cancelled).
+    """
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'PROXY_SINGLE_FLIGHT', {})}
+
+
+def _count(name):
+    with _lock:
+        _counters[name] += 1
+
+
+def stats():
+    with _lock:
+        return {**_counters, 'in_flight': len(_in_flight)}
+
+
+def _keys(key):
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    return f'single-flight-lock:{digest}', f'single-flight-result:{digest}'
+
+
+def _unpack(outcome):
+    kind, value = outcome
+    if kind == 'error':
+        raise UpstreamError(*value)
+    return value
+
+
+async def _fetch_shared(key, fetch, config):
+    """
+    ``fetch()`` unless another process is already fetching ``key``, in which
+    case its published outcome is used.
+    """
+    lock_key, result_key = _keys(key)
+    deadline = time.monotonic() + config['WAIT_TIMEOUT']
+    while True:
+        outcome = await cache.aget(result_key)
+        if outcome is not None:
+            _count('shared')
+            return _unpack(outcome)
+
+        token = uuid.uuid4().hex
+        if await cache.aadd(lock_key, token, config['LOCK_TIMEOUT']):
+            try:
+                try:
+                    result = await fetch()
+                except UpstreamError as e:
+                    await cache.aset(result_key, ('error', (e.status_code, str(e))), config['RESULT_TTL'])
+                    raise
+                await cache.aset(result_key, ('ok', result), config['RESULT_TTL'])
+                _count('fetched')
+                return result
+            finally:
+                if await cache.aget(lock_key) == token:
+                    await cache.adelete(lock_key)
+
+        if time.monotonic() >= deadline:
+            _count('timed_out')
+            return await fetch()
+        await asyncio.sleep(config['POLL_INTERVAL'])
+
+
+async def run(key, fetch):
+    """
+    Return ``await fetch()``, sharing the call with concurrent callers of the same ``key``.
+    """
+    config = get_config()
+    if not config['ENABLED']:
+        return await fetch()
+
+    with _lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+
+    if not leader:
+        _count('joined')
+        try:
+            # works across event loops, e.g. WSGI threads running async views
+            return await asyncio.wrap_future(future)
+        except LeaderGone:
+            return await run(key, fetch)
+
+    try:
+        result = await _fetch_shared(key, fetch, config)
+    except asyncio.CancelledError:
+        future.set_exception(LeaderGone(key))
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _lock:
+            _in_flight.pop(key, None)
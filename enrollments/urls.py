@@ -2,25 +2,43 @@ from django.urls import path
 from .views import (
     home_view,
     enrollments_view,
+    enrollments_api,
+    enrollments_export,
+    enrollment_keys_api,
+    enrollment_queue_api,
     manage_view,
     receive_enrollment_data,
     proxy_api_request,
+    proxy_users_batch,
     profile_view,
+    profile_batch_view,
     exist_view,
     badges_view,
+    badge_awards_view,
+    username_autocomplete,
     user_badges_api,
+    user_badges_batch_api,
     badge_verification_view,
 )
 
 urlpatterns = [
     path('', home_view, name='home_view'),
     path('enrollments/', enrollments_view, name='enrollments_view'),
+    path('enrollments/api/', enrollments_api, name='enrollments_api'),
+    path('enrollments/export/', enrollments_export, name='enrollments_export'),
+    path('enrollments/keys/', enrollment_keys_api, name='enrollment_keys_api'),
+    path('enrollments/queue/', enrollment_queue_api, name='enrollment_queue_api'),
     path('manage/', manage_view, name='manage_view'),
     path('badges/', badges_view, name='badges_view'),
+    path('badges/<int:badge_id>/awards/', badge_awards_view, name='badge_awards_view'),
+    path('usernames/', username_autocomplete, name='username_autocomplete'),
     path('badge/<str:verification_code>/', badge_verification_view, name='badge_verification'),
     path('endpoint/', receive_enrollment_data, name='receive_enrollment_data'),
     path('proxy/', proxy_api_request, name='proxy_api_request'),
+    path('proxy/users/', proxy_users_batch, name='proxy_users_batch'),
     path('profile/', profile_view, name='profile_view'),
+    path('profile/batch/', profile_batch_view, name='profile_batch_view'),
     path('exists/', exist_view, name='exist_view'),
     path('user-badges/', user_badges_api, name='user_badges_api'),
+    path('user-badges/batch/', user_badges_batch_api, name='user_badges_batch_api'),
 ]
\ No newline at end of file
@@ -0,0 +1,172 @@
+"""
+Username lookup across Profile, Enrollment and UserBadge.
+
+Every known username is mirrored into the UsernameSearch table together with
+a normalized, lower-cased form (``+``, ``%20`` and ``_`` become spaces, as in
+exist_view). Prefix matches use the B-tree index on that column; substring
+matches use an FTS5 trigram table on SQLite or an ngram FULLTEXT index on
+MySQL when the migration could create one. Results are cached for
+``USERNAME_AUTOCOMPLETE_CACHE_TTL`` seconds.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+
+from enrollments.models import Enrollment, Profile, UserBadge, UsernameSearch
+
+
+FTS_TABLE = 'enrollments_usernamesearch_fts'
+FULLTEXT_INDEX = 'enrollments_usernamesearch_ngram'
+
+# source name -> (UsernameSearch flag, model, username field)
+SOURCES = {
+    'profile': ('has_profile', Profile, 'username'),
+    'enrollment': ('has_enrollment', Enrollment, 'user'),
+    'badge': ('has_badge', UserBadge, 'user'),
+}
+
+BATCH_SIZE = 500
+
+_substring_backend = None
+
+
+def normalize_username(username):
+    """
+    Normalize a username the way URLs and wiki links mangle it: + and %20 and _ become spaces.
+    """
+    return username.replace('+', ' ').replace('%20', ' ').replace('_', ' ')
+
+
+def search_key(username):
+    return normalize_username(username).strip().lower()
+
+
+def _batches(items, size=BATCH_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def register(usernames, source):
+    """
+    Record that ``usernames`` exist in ``source`` (a key of SOURCES).
+    """
+    flag = SOURCES[source][0]
+    for batch in _batches(set(u for u in usernames if u)):
+        with transaction.atomic():
+            UsernameSearch.objects.bulk_create(
+                [UsernameSearch(username=u, normalized=search_key(u), **{flag: True}) for u in batch],
+                ignore_conflicts=True,
+            )
+            UsernameSearch.objects.filter(username__in=batch, **{flag: False}).update(**{flag: True})
+
+
+def unregister(usernames, source):
+    """
+    Drop ``source`` from ``usernames`` that no longer exist there, and forget
+    usernames that no source knows any more.
+    """
+    flag, model, field = SOURCES[source]
+    for batch in _batches(set(u for u in usernames if u)):
+        still_there = set(model.objects.filter(**{f'{field}__in': batch}).values_list(field, flat=True))
+        gone = [u for u in batch if u not in still_there]
+        if not gone:
+            continue
+        with transaction.atomic():
+            UsernameSearch.objects.filter(username__in=gone).update(**{flag: False})
+            UsernameSearch.objects.filter(
+                username__in=gone, has_profile=False, has_enrollment=False, has_badge=False,
+            ).delete()
+
+
+def rebuild():
+    """
+    Recreate the whole UsernameSearch table from the source tables.
+    """
+    UsernameSearch.objects.all().delete()
+    for source, (flag, model, field) in SOURCES.items():
+        names = model.objects.values_list(field, flat=True).distinct().iterator(chunk_size=BATCH_SIZE * 4)
+        register(names, source)
+    return UsernameSearch.objects.count()
+
+
+def substring_backend():
+    """
+    Which substring index is available: 'fts5', 'fulltext' or None.
+    """
+    global _substring_backend
+    if _substring_backend is None:
+        backend = ''
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                backend = 'fts5' if cursor.fetchone() else ''
+            elif connection.vendor == 'mysql':
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.statistics "
+                    "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+                    [UsernameSearch._meta.db_table, FULLTEXT_INDEX],
+                )
+                backend = 'fulltext' if cursor.fetchone() else ''
+        _substring_backend = backend
+    return _substring_backend or None
+
+
+def _prefix_condition(key):
+    if connection.vendor == 'mysql':
+        # LIKE 'key%' is an index range scan under MySQL's case-insensitive collations
+        return Q(normalized__istartswith=key)
+    return Q(normalized__gte=key, normalized__lt=key + '\uffff')
+
+
+def _substring_ids(key, limit):
+    backend = substring_backend()
+    phrase = '"%s"' % key.replace('"', '""')
+    with connection.cursor() as cursor:
+        if backend == 'fts5' and len(key) >= 3:
+            cursor.execute(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s", [phrase, limit])
+        elif backend == 'fulltext' and len(key) >= 2:
+            cursor.execute(
+                f"SELECT id FROM {UsernameSearch._meta.db_table} "
+                "WHERE MATCH(normalized) AGAINST (%s IN BOOLEAN MODE) LIMIT %s",
+                [phrase, limit],
+            )
+        else:
+            return None
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(query, limit=20, source=None):
+    """
+    Usernames whose normalized form starts with ``query``, followed by those
+    that contain it, optionally restricted to one source.
+    """
+    key = search_key(query)
+    if not key:
+        return []
+
+    cache_key = 'usernames:%s' % hashlib.sha1(f"{source}:{limit}:{key}".encode()).hexdigest()
+    results = cache.get(cache_key)
+    if results is not None:
+        return results
+
+    queryset = UsernameSearch.objects.all()
+    if source:
+        queryset = queryset.filter(**{SOURCES[source][0]: True})
+
+    results = list(
+        queryset.filter(_prefix_condition(key)).order_by('normalized', 'username').values_list('username', flat=True)[:limit]
+    )
+    if len(results) < limit:
+        ids = _substring_ids(key, limit * 5)
+        contains = queryset.filter(id__in=ids) if ids is not None else queryset.filter(normalized__contains=key)
+        results += list(
+            contains.exclude(username__in=results).order_by('normalized', 'username')
+            .values_list('username', flat=True)[:limit - len(results)]
+        )
+
+    cache.set(cache_key, results, getattr(settings, 'USERNAME_AUTOCOMPLETE_CACHE_TTL', 60))
+    return results
@@ -0,0 +1,78 @@
+"""
+Allocation of the short random codes that identify a UserBadge on its
+public certificate page.
+
+Codes are drawn a batch at a time; each batch is checked against the
+UserBadge table with a single ``verification_code__in`` query and only the
+codes already taken are redrawn, so allocating one code or a thousand costs
+a constant number of queries. ``stats()`` reports how much of the keyspace
+is in use and how often draws collide.
+"""
+import secrets
+import string
+import threading
+
+from enrollments.models import UserBadge
+
+
+ALPHABET = string.ascii_lowercase + string.digits
+LENGTH = UserBadge._meta.get_field('verification_code').max_length
+KEYSPACE = len(ALPHABET) ** LENGTH
+MAX_ROUNDS = 20
+
+_counters = {'drawn': 0, 'collisions': 0, 'rounds': 0}
+_counters_lock = threading.Lock()
+
+
+class KeyspaceExhausted(ValueError):
+    pass
+
+
+def _draw(count):
+    return {''.join(secrets.choice(ALPHABET) for _ in range(LENGTH)) for _ in range(count)}
+
+
+def generate(count=1):
+    """
+    Return ``count`` distinct codes that no UserBadge uses yet.
+    """
+    codes = set()
+    for _ in range(MAX_ROUNDS):
+        missing = count - len(codes)
+        if missing <= 0:
+            break
+        candidates = _draw(missing) - codes
+        taken = set(
+            UserBadge.objects.filter(verification_code__in=candidates).values_list('verification_code', flat=True)
+        )
+        codes |= candidates - taken
+        with _counters_lock:
+            _counters['drawn'] += missing
+            _counters['collisions'] += missing - len(candidates - taken)
+            _counters['rounds'] += 1
+    else:
+        if len(codes) < count:
+            raise KeyspaceExhausted(f'Could not allocate {count} unique verification codes after {MAX_ROUNDS} rounds.')
+    return list(codes)
+
+
+def new_code():
+    return generate(1)[0]
+
+
+def stats():
+    """
+    Keyspace usage and the collision counters of this process.
+    """
+    issued = UserBadge.objects.count()
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        'alphabet': ALPHABET,
+        'length': LENGTH,
+        'keyspace': KEYSPACE,
+        'issued': issued,
+        # also the chance that one fresh draw hits an existing code
+        'usage': issued / KEYSPACE,
+        **counters,
+    }
@@ -1,33 +1,46 @@
 # Standard library imports
+import asyncio
 import json
-import uuid
-import hashlib
-import requests
 from datetime import datetime
 from functools import wraps
-from pathlib import Path
-import random
-import string
-
-# Third-party imports
-import jwt
-from cryptography.hazmat.primitives import serialization
+from concurrent.futures import ThreadPoolExecutor
 
 # Django imports
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.contrib import admin
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.contrib.auth.views import redirect_to_login
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Prefetch, Window
+from django.db.models.functions import RowNumber
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from django.shortcuts import render, get_object_or_404
+from django.template.loader import render_to_string
 from django.utils.timezone import make_aware
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.http import require_GET, require_http_methods, require_POST
 
 # Local application imports
 from credentials.models import CustomUser
-from enrollments.models import Enrollment, Profile, Badge, UserBadge
+from enrollments import (
+    async_http_client, badge_cache, cache_stats, capacity_labels, exports, ingest, ingest_queue, listing,
+    single_flight, username_search, verification_codes, webhook_keys,
+)
+from enrollments.http_client import UpstreamError
+from enrollments.list_cache import CACHEABLE_LISTS, ListCache
+from enrollments.models import Enrollment, EnrollmentKey, Profile, Badge, UserBadge
+
 
+CAPX_API_URL = "https://capx-backend.toolforge.org"
+# Reference lists needed to turn the ids in a CapX user record into names
+ENRICHMENT_LISTS = ('territory', 'affiliation', 'wikimedia_project', 'skills', 'badges', 'language')
 
-PUBLIC_KEY = serialization.load_pem_public_key(open(settings.HOME + ('/' if settings.HOME else '') + 'public_key.pem', 'rb').read())
+list_cache = ListCache(CAPX_API_URL + "/list/{item}/")
+# one thread per reference list, so a cold batch fetches them all at once
+list_executor = ThreadPoolExecutor(max_workers=len(ENRICHMENT_LISTS) + 1, thread_name_prefix='capx-lists')
 
 @require_GET
 def home_view(request):
@@ -48,11 +61,28 @@ def approved_required(view_func):
             return render(request, 'home.html')
     return _wrapped_view
 
-@login_required
-@approved_required
-def proxy_api_request(request):
+def async_approved_required(view_func):
+    """
+    login_required and approved_required for async views, whose user has to
+    be loaded off the event loop (Django's decorators are sync-only before 5.0).
+    """
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        # resolves the lazy request.user, which may query the database
+        user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+        if user is None:
+            return redirect_to_login(request.get_full_path())
+        if user.is_approved:
+            return await view_func(request, *args, **kwargs)
+        else:
+            return await sync_to_async(render)(request, 'home.html')
+    return _wrapped_view
+
+@async_approved_required
+async def proxy_api_request(request):
     """
     Proxy API request to the external service.
+    Async, so under ASGI upstream calls wait on the event loop instead of holding a thread.
     """
     if request.method == 'GET':
         query = request.GET.get('query', '')
@@ -60,17 +90,24 @@ def proxy_api_request(request):
         if not query and not items:
             return JsonResponse({'error': 'Query or item parameter is required'}, status=400)
 
+        if items and not query and items in CACHEABLE_LISTS:
+            return await sync_to_async(cached_list_response)(request, items)
+
         if query:
-            api_url = f"https://capx-backend.toolforge.org/users/?{query}"
-            response = requests.get(api_url)
+            api_url = f"{CAPX_API_URL}/users/?{query}"
         elif items:
-            api_url = f"https://capx-backend.toolforge.org/list/{items}/"
-            response = requests.get(api_url)
+            api_url = f"{CAPX_API_URL}/list/{items}/"
+
+        try:
+            # identical concurrent requests, here or in other workers, share one upstream call
+            status_code, payload = await single_flight.run(f'GET {api_url}', lambda: fetch_capx_json(api_url))
+        except UpstreamError as e:
+            return JsonResponse({'error': str(e)}, status=e.status_code)
 
-        if response.status_code == 200:
-            return JsonResponse(response.json())
+        if status_code == 200:
+            return JsonResponse(payload)
         else:
-            return JsonResponse({'error': 'Failed to fetch data from external service'}, status=response.status_code)
+            return JsonResponse({'error': 'Failed to fetch data from external service'}, status=status_code)
     elif request.method == 'POST':
         try:
             body = json.loads(request.body)
@@ -81,83 +118,262 @@ def proxy_api_request(request):
         if not qids:
             return JsonResponse({'error': 'QIDs parameter is required'}, status=400)
 
-        # Construct SPARQL query
-        mb_query_text = f"""PREFIX wbt:<https://metabase.wikibase.cloud/prop/direct/>  
-            SELECT ?item ?itemLabel ?value WHERE {{  
-                VALUES ?value {{{" ".join([f'"{qid}"' for qid in qids])}}}  
-                ?item wbt:P67/wbt:P1 ?value.  
-                SERVICE wikibase:label {{ bd:serviceParam wikibase:language 'en'. }}
-            }}
-        """
-        
-        api_url = "https://metabase.wikibase.cloud/query/sparql"
-        response = requests.post(
-            api_url,
-            data={"query": mb_query_text},
-            headers={
-                "Accept": "application/sparql-results+json",
-                "User-Agent": "CapX/1.0",
-            },
-        )
-
-        if response.status_code == 200:
-            # Process the raw results to a consistent format
-            raw_results = response.json().get("results", {}).get("bindings", [])
-            results = [
-                {
-                    "wd_code": item.get("value", {}).get("value"),
-                    "name": item.get("itemLabel", {}).get("value"),
-                    "item": item.get("item", {}).get("value"),
-                }
-                for item in raw_results
-                if item.get("item") and item.get("itemLabel") and item.get("value")
-            ]
-            return JsonResponse(results, safe=False)
+        try:
+            results = await capacity_labels.aresolve(qids)
+        except UpstreamError as e:
+            return JsonResponse({'error': 'Failed to fetch data from external service'}, status=e.status_code)
+        return JsonResponse(results, safe=False)
+    return HttpResponseNotAllowed(['GET', 'POST'])
+
+
+async def fetch_capx_json(url):
+    """
+    ``(status_code, payload)`` of a CapX GET; the payload is None unless the status is 200.
+    """
+    response = await async_http_client.get(url)
+    return response.status_code, response.json() if response.status_code == 200 else None
+
+
+def cached_list_response(request, item):
+    """
+    Serve a CapX reference list from the list cache, honouring conditional
+    requests and telling the browser how long it may reuse the payload.
+    """
+    try:
+        entry = list_cache.get(item)
+    except UpstreamError as e:
+        return JsonResponse({'error': 'Failed to fetch data from external service'}, status=e.status_code)
+
+    response = get_conditional_response(request, etag=entry['etag']) or JsonResponse(entry['data'])
+    response['ETag'] = entry['etag']
+    patch_cache_control(
+        response,
+        private=True,
+        max_age=list_cache.max_age(item, entry),
+        stale_while_revalidate=list_cache.config['STALE_WHILE_REVALIDATE'],
+    )
+    return response
+
+
+def fetch_capx_list(item):
+    """
+    Fetch one of the CapX reference lists (id -> name mapping).
+    """
+    return list_cache.get(item)['data']
+
+
+async def fetch_capx_user(username):
+    """
+    Fetch the CapX profile of a single user, or None if the user is unknown.
+    """
+    response = await async_http_client.get(f"{CAPX_API_URL}/users/", params={'user__username': username})
+    if response.status_code != 200:
+        raise UpstreamError(response.status_code)
+    results = response.json().get('results') or []
+    return results[0] if results else None
+
+
+def _resolve_names(ids, lookup):
+    return ', '.join(lookup.get(str(i), 'Unknown') for i in (ids or []))
+
+
+def _enrich_user(user, lists, capacity_names):
+    """
+    Turn a raw CapX user record into the flat, human-readable row used by the enrollments page.
+    """
+    skills = lists['skills']
+
+    def capacities(ids):
+        return ', '.join(capacity_names.get(skills.get(str(i)), 'Unknown') for i in (ids or []))
+
+    languages = ', '.join(
+        f"{lists['language'].get(str(lang.get('id')), 'Unknown')} ({lang.get('proficiency') or '?'})"
+        for lang in (user.get('language') or [])
+    )
+    return {
+        'found': True,
+        'joined_date': (user.get('user') or {}).get('date_joined'),
+        'last_update': user.get('last_update'),
+        'last_login': user.get('last_login'),
+        'import': 'Imported' if user.get('automated_lets_connect') else '',
+        'territory': _resolve_names(user.get('territory'), lists['territory']),
+        'affiliation': _resolve_names(user.get('affiliation'), lists['affiliation']),
+        'manager': _resolve_names(user.get('is_manager'), lists['affiliation']),
+        'language': languages,
+        'wikimedia_projects': _resolve_names(user.get('wikimedia_projects'), lists['wikimedia_project']),
+        'available_capacities': capacities(user.get('skills_available')),
+        'known_capacities': capacities(user.get('skills_known')),
+        'wanted_capacities': capacities(user.get('skills_wanted')),
+        'badges': _resolve_names(user.get('badges'), lists['badges']),
+    }
+
+
+@async_approved_required
+async def proxy_users_batch(request):
+    """
+    Fetch and enrich the CapX data of many users in a single request.
+    Expects a JSON body: { "usernames": [...] }
+    Upstream lookups run concurrently (at most PROXY_BATCH_MAX_WORKERS at a
+    time) and the reference lists are resolved server-side, so the response
+    is ready to render. More than PROXY_BATCH_MAX_USERS distinct usernames
+    are refused with 400.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        usernames = json.loads(request.body).get('usernames', [])
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    if not isinstance(usernames, list) or not usernames:
+        return JsonResponse({'error': 'Usernames parameter is required'}, status=400)
+
+    max_users = getattr(settings, 'PROXY_BATCH_MAX_USERS', 10000)
+    usernames = list(dict.fromkeys(str(u).strip() for u in usernames if str(u).strip()))
+    if len(usernames) > max_users:
+        return JsonResponse({
+            'error': f'Too many usernames: {len(usernames)} given, at most {max_users} are allowed per request',
+        }, status=400)
+
+    list_items = ENRICHMENT_LISTS + ('users',)
+    try:
+        # served from the list cache; misses go upstream in parallel (no
+        # database access, so they need not run on the thread-sensitive thread)
+        fetch_list = sync_to_async(fetch_capx_list, thread_sensitive=False, executor=list_executor)
+        lists = dict(zip(list_items, await asyncio.gather(*(fetch_list(item) for item in list_items))))
+    except UpstreamError as e:
+        return JsonResponse({'error': 'Failed to fetch data from external service'}, status=e.status_code)
+
+    # Only users known to CapX are worth a lookup
+    valid_usernames = set(lists.pop('users').values())
+    to_fetch = [u for u in usernames if u in valid_usernames]
+    slots = asyncio.Semaphore(getattr(settings, 'PROXY_BATCH_MAX_WORKERS', 8))
+
+    async def fetch(username):
+        async with slots:
+            return await fetch_capx_user(username)
+
+    outcomes = await asyncio.gather(*(fetch(u) for u in to_fetch), return_exceptions=True)
+    raw_users = {}
+    errors = {}
+    for username, outcome in zip(to_fetch, outcomes):
+        if isinstance(outcome, Exception):
+            errors[username] = str(outcome)
+        else:
+            raw_users[username] = outcome
+
+    skills = lists['skills']
+    qids = sorted({
+        skills[str(i)]
+        for user in raw_users.values() if user
+        for key in ('skills_available', 'skills_known', 'skills_wanted')
+        for i in (user.get(key) or [])
+        if skills.get(str(i))
+    })
+    capacity_names = {}
+    if qids:
+        try:
+            capacity_names = {r['wd_code']: r['name'] for r in await capacity_labels.aresolve(qids)}
+        except UpstreamError:
+            # Labels are cosmetic; fall back to 'Unknown' rather than failing the whole batch
+            pass
+
+    users = {}
+    for username in usernames:
+        user = raw_users.get(username)
+        if user:
+            users[username] = _enrich_user(user, lists, capacity_names)
         else:
-            return JsonResponse({'error': 'Failed to fetch data from external service'}, status=response.status_code)
+            users[username] = {'found': False}
+
+    return JsonResponse({'users': users, 'errors': errors})
 
 @require_GET
 @login_required
 @approved_required
 def enrollments_view(request):
     """
-    Render the enrollment page.
-    """
-    enrollments = list(Enrollment.objects.all())
-    all_keys = set()
-    for enrollment in enrollments:
-        all_keys.update(enrollment.data.keys())
-
-    all_keys.discard("timestamp")
-    all_keys.discard("nonce")
-    all_keys.add("legacy")
-    all_keys = sorted(all_keys, key=lambda x: (x != "user", x))
-
-    user_names = Enrollment.objects.values_list('user', flat=True)
-    profiles = Profile.objects.exclude(username__in=user_names)
-
-    for profile in profiles:
-        enrollments.append({
-            "user": profile.username,
-            "data": {
-                "user": profile.username,
-                "email": profile.email,
-                "full_name": profile.full_name,
-            },
-        })
-
-    legacy_users = set(Profile.objects.values_list('username', flat=True))
-    for i, enrollment in enumerate(enrollments):
-        if isinstance(enrollment, Enrollment):
-            enrollment.data["legacy"] = True if enrollment.user in legacy_users else False
-        elif isinstance(enrollment, dict):
-            enrollment["data"]["legacy"] = True if enrollment["user"] in legacy_users else False
-
+    Render the enrollment page. Rows are loaded page by page from enrollments_api.
+    """
     return render(request, 'enrollments.html', {
-        'enrollments': enrollments,
-        'all_enrollment_keys': all_keys
+        'all_enrollment_keys': listing.enrollment_keys(),
     })
 
+@require_GET
+@login_required
+@approved_required
+def enrollments_api(request):
+    """
+    JSON page of enrollments (and profiles that never enrolled).
+    Query parameters:
+      - sort: any enrollment data key, 'timestamp' or 'legacy' (default 'user')
+      - order: 'asc' or 'desc'
+      - q: case-insensitive text filter
+      - cursor: value of 'next' from the previous page
+      - limit: page size (max ENROLLMENTS_API_MAX_LIMIT)
+    """
+    max_limit = getattr(settings, 'ENROLLMENTS_API_MAX_LIMIT', 500)
+    try:
+        limit = min(max(int(request.GET.get('limit', 100)), 1), max_limit)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+
+    cursor = request.GET.get('cursor')
+    try:
+        cursor = listing.decode_cursor(cursor) if cursor else None
+    except listing.InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    rows, next_cursor = listing.page(
+        sort=request.GET.get('sort') or 'user',
+        descending=request.GET.get('order') == 'desc',
+        query=request.GET.get('q', '').strip(),
+        cursor=cursor,
+        limit=limit,
+    )
+    return JsonResponse({'results': rows, 'next': next_cursor})
+
+@require_GET
+@login_required
+@approved_required
+def enrollment_keys_api(request):
+    """
+    Schema of the dynamic enrollment data, read from the key index.
+    """
+    keys = EnrollmentKey.objects.order_by('name').values(
+        'name', 'first_seen', 'last_seen', 'occurrences', 'value_types'
+    )
+    return JsonResponse({'keys': list(keys)})
+
+@require_GET
+@login_required
+@approved_required
+def enrollment_queue_api(request):
+    """
+    Depth and lag of the queued ingestion mode's submission queue.
+    """
+    return JsonResponse(ingest_queue.stats())
+
+@require_GET
+@login_required
+@approved_required
+def enrollments_export(request):
+    """
+    Stream every enrollment (and profiles that never enrolled) as CSV, JSONL or XLSX.
+    Query parameters: format (csv, jsonl, xlsx) and an optional q text filter.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in exports.FORMATS:
+        return JsonResponse({'error': 'Format must be one of: ' + ', '.join(exports.FORMATS)}, status=400)
+
+    content_type, extension = exports.FORMATS[export_format]
+    response = StreamingHttpResponse(
+        exports.stream(export_format, request.GET.get('q', '').strip()),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="enrollment_data.{extension}"'
+    return response
+
 @login_required
 @approved_required
 def manage_view(request):
@@ -218,7 +434,11 @@ def profile_view(request):
         return JsonResponse({'error': 'Username parameter is required'}, status=400)
 
     profile = get_object_or_404(Profile, username=username)
-    return JsonResponse({
+    return JsonResponse(profile_payload(profile))
+
+
+def profile_payload(profile):
+    return {
         'username': profile.username,
         'username_org': profile.username_org,
         'reconciled_affiliation': profile.reconciled_affiliation,
@@ -227,6 +447,51 @@ def profile_view(request):
         'reconciled_projects': profile.reconciled_projects,
         'reconciled_want_to_learn': profile.reconciled_want_to_learn,
         'reconciled_want_to_share': profile.reconciled_want_to_share
+    }
+
+
+def batch_usernames(request):
+    """
+    Usernames of a public batch request, from repeated ``username`` query
+    parameters (GET) or a JSON body ``{"usernames": [...]}`` (POST).
+    Returns ``(usernames, error_response)``.
+    """
+    if request.method == 'POST':
+        try:
+            usernames = json.loads(request.body).get('usernames', [])
+        except (json.JSONDecodeError, AttributeError):
+            return None, JsonResponse({'error': 'Invalid JSON'}, status=400)
+        if not isinstance(usernames, list):
+            return None, JsonResponse({'error': 'Usernames must be a list'}, status=400)
+    else:
+        usernames = request.GET.getlist('username')
+
+    usernames = list(dict.fromkeys(str(u).strip() for u in usernames if str(u).strip()))
+    if not usernames:
+        return None, JsonResponse({'error': 'Username parameter is required'}, status=400)
+    max_users = getattr(settings, 'PUBLIC_API_BATCH_MAX_USERS', 100)
+    if len(usernames) > max_users:
+        return None, JsonResponse({'error': f'At most {max_users} usernames are allowed'}, status=400)
+    return usernames, None
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def profile_batch_view(request):
+    """
+    Public API: GET /profile/batch/?username=<a>&username=<b> or POST { "usernames": [...] }
+    Returns { "profiles": { username: profile or null } } from one query.
+    """
+    usernames, error = batch_usernames(request)
+    if error:
+        return error
+
+    found = {profile.username: profile for profile in Profile.objects.filter(username__in=usernames)}
+    return JsonResponse({
+        'profiles': {
+            username: profile_payload(found[username]) if username in found else None
+            for username in usernames
+        },
     })
 
 @require_GET
@@ -239,7 +504,7 @@ def exist_view(request):
         return JsonResponse({'error': 'Username parameter is required'}, status=400)
 
     # Normalize: replace + and %20 with spaces
-    username_norm = username.replace('+', ' ').replace('%20', ' ').replace('_', ' ')
+    username_norm = username_search.normalize_username(username)
     exists = Profile.objects.filter(username=username_norm).exists()
     # Also, check in Enrollment as a fallback
     if not exists:
@@ -253,29 +518,35 @@ def user_badges_api(request):
     Public API: GET /user-badges/?username=<name>
     Returns a list of badges awarded to the given username.
     Each item: { name, picture, description, timestamp, verification_code }
+    Served from badge_cache and answers conditional requests with 304.
     """
     username = request.GET.get('username')
     if not username:
         return JsonResponse({'error': 'Username parameter is required'}, status=400)
 
-    userbadges = (
-        UserBadge.objects.filter(user=username)
-        .select_related('badge')
-        .order_by('-issued_at')
-    )
+    entry = badge_cache.user_badges(username)
+    response = get_conditional_response(request, etag=entry['etag']) or JsonResponse(entry['data'], safe=False)
+    response['ETag'] = entry['etag']
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'USER_BADGES_MAX_AGE', 60))
+    return response
 
-    results = [
-        {
-            'name': ub.badge.name,
-            'picture': ub.badge.image,
-            'description': ub.badge.description,
-            'timestamp': ub.issued_at.isoformat(),
-            'verification_code': ub.verification_code,
-        }
-        for ub in userbadges
-    ]
 
-    return JsonResponse(results, safe=False)
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def user_badges_batch_api(request):
+    """
+    Public API: GET /user-badges/batch/?username=<a>&username=<b> or POST { "usernames": [...] }
+    Returns { "badges": { username: [ ...same items as /user-badges/... ] } }.
+    Cached users come from badge_cache; the rest are loaded with one query.
+    """
+    usernames, error = batch_usernames(request)
+    if error:
+        return error
+
+    entries = badge_cache.user_badges_many(usernames)
+    response = JsonResponse({'badges': {username: entries[username]['data'] for username in usernames}})
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'USER_BADGES_MAX_AGE', 60))
+    return response
 
 
 @require_GET
@@ -283,9 +554,22 @@ def badge_verification_view(request, verification_code: str):
     """
     Public page: GET /badge/<verification_code>/
     Renders a certificate-like page with badge, user, and issuance info.
+    The rendered page (or the absence of one) is cached by badge_cache.
     """
-    userbadge = get_object_or_404(UserBadge.objects.select_related('badge'), verification_code=verification_code)
+    entry = badge_cache.certificate(verification_code, render_certificate)
+    if entry is None:
+        raise Http404('No award with this verification code')
+
+    response = get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'],
+    ) or HttpResponse(entry['html'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'BADGE_CERTIFICATE_MAX_AGE', 3600))
+    return response
 
+
+def render_certificate(userbadge):
     context = {
         'username': userbadge.user,
         'badge': userbadge.badge,
@@ -295,7 +579,73 @@ def badge_verification_view(request, verification_code: str):
         'site_logo': "https://upload.wikimedia.org/wikipedia/commons/4/4c/Let%27s_Connect_logo.svg",
         'brand_color': "#122d4c",
     }
-    return render(request, 'badge_certificate.html', context)
+    return render_to_string('badge_certificate.html', context)
+
+
+def handle_badge_action(request):
+    """
+    Apply one of the badge management POST actions.
+    Returns a (message, error) tuple.
+    """
+    message = None
+    error = None
+    action = request.POST.get('action')
+    try:
+        if action == 'add_badge':
+            name = request.POST.get('name', '').strip()
+            description = request.POST.get('description', '').strip()
+            image = request.POST.get('image', '').strip()
+            if not name:
+                raise ValueError('Badge name is required')
+            Badge.objects.create(name=name, description=description, image=image)
+            message = f"Badge '{name}' created."
+
+        elif action == 'edit_badge':
+            badge_id = request.POST.get('badge_id')
+            badge = get_object_or_404(Badge, id=badge_id)
+            name = request.POST.get('name', '').strip()
+            description = request.POST.get('description', '').strip()
+            image = request.POST.get('image', '').strip()
+            if not name:
+                raise ValueError('Badge name is required')
+            badge.name = name
+            badge.description = description
+            badge.image = image
+            badge.save()
+            message = f"Badge '{name}' updated."
+
+        elif action == 'grant_badge':
+            badge_id = request.POST.get('badge_id')
+            username = request.POST.get('username', '').strip()
+            if not username:
+                raise ValueError('Username is required')
+            badge = get_object_or_404(Badge, id=badge_id)
+            # Managers can award to any known username; UserBadge.user is a CharField
+            # and duplicates are prevented via unique_together
+            verification_code = verification_codes.new_code()
+            try:
+                UserBadge.objects.create(user=username, badge=badge, verification_code=verification_code)
+                message = f"Granted '{badge.name}' to {username}."
+            except Exception as e:
+                error = str(e)
+
+        elif action == 'revoke_badge':
+            ub_id = request.POST.get('userbadge_id')
+            userbadge = get_object_or_404(UserBadge, id=ub_id)
+            userbadge.delete()
+            message = 'Badge revoked.'
+
+        elif action == 'delete_badge':
+            badge_id = request.POST.get('badge_id')
+            badge = get_object_or_404(Badge, id=badge_id)
+            name = badge.name
+            badge.delete()  # cascades to UserBadge
+            message = f"Badge '{name}' deleted."
+
+    except Exception as e:
+        error = str(e)
+
+    return message, error
 
 
 @login_required
@@ -303,98 +653,90 @@ def badge_verification_view(request, verification_code: str):
 def badges_view(request):
     """
     Manage badges: list, create, edit, and manage awarded users.
+    Only the most recent awards of each badge are shown; badge_awards_view pages through the rest.
     Actions (POST):
       - add_badge: name, description, image
       - edit_badge: badge_id, name, description, image
       - grant_badge: badge_id, username
       - revoke_badge: userbadge_id
+      - delete_badge: badge_id
     """
     message = None
     error = None
 
     if request.method == 'POST':
-        action = request.POST.get('action')
-        try:
-            if action == 'add_badge':
-                name = request.POST.get('name', '').strip()
-                description = request.POST.get('description', '').strip()
-                image = request.POST.get('image', '').strip()
-                if not name:
-                    raise ValueError('Badge name is required')
-                Badge.objects.create(name=name, description=description, image=image)
-                message = f"Badge '{name}' created."
-
-            elif action == 'edit_badge':
-                badge_id = request.POST.get('badge_id')
-                badge = get_object_or_404(Badge, id=badge_id)
-                name = request.POST.get('name', '').strip()
-                description = request.POST.get('description', '').strip()
-                image = request.POST.get('image', '').strip()
-                if not name:
-                    raise ValueError('Badge name is required')
-                badge.name = name
-                badge.description = description
-                badge.image = image
-                badge.save()
-                message = f"Badge '{name}' updated."
-
-            elif action == 'grant_badge':
-                badge_id = request.POST.get('badge_id')
-                username = request.POST.get('username', '').strip()
-                if not username:
-                    raise ValueError('Username is required')
-                badge = get_object_or_404(Badge, id=badge_id)
-                # Ensure profile exists as our users are char usernames in Profile/Enrollment
-                # This does not restrict to approved users; managers can award to any known username
-                # Prevent duplicates via unique_together
-                if not Profile.objects.filter(username=username).exists():
-                    # allow awarding even if profile not present, as UserBadge.user is CharField
-                    pass
-                # Try to generate a unique verification_code
-                for _ in range(20):
-                    verification_code = ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
-                    if not UserBadge.objects.filter(verification_code=verification_code).exists():
-                        break
-                else:
-                    raise ValueError('Could not generate a unique verification code after 20 attempts.')
-                try:
-                    UserBadge.objects.create(user=username, badge=badge, verification_code=verification_code)
-                    message = f"Granted '{badge.name}' to {username}."
-                except Exception as e:
-                    error = str(e)
-
-            elif action == 'revoke_badge':
-                ub_id = request.POST.get('userbadge_id')
-                userbadge = get_object_or_404(UserBadge, id=ub_id)
-                userbadge.delete()
-                message = 'Badge revoked.'
-
-            elif action == 'delete_badge':
-                badge_id = request.POST.get('badge_id')
-                badge = get_object_or_404(Badge, id=badge_id)
-                name = badge.name
-                badge.delete()  # cascades to UserBadge
-                message = f"Badge '{name}' deleted."
-
-        except Exception as e:
-            error = str(e)
-
-    badges = Badge.objects.all().order_by('name')
-    profiles = Profile.objects.all().order_by('username')
-    # Build mapping of badge_id -> awarded list
-    awarded = {
-        b.id: list(UserBadge.objects.filter(badge=b).order_by('-issued_at'))
-        for b in badges
-    }
+        message, error = handle_badge_action(request)
+
+    preview_size = getattr(settings, 'BADGE_AWARDS_PREVIEW', 10)
+    badges = (
+        Badge.objects.annotate(award_count=Count('awarded_users'))
+        .prefetch_related(Prefetch(
+            'awarded_users',
+            # Keep only the latest awards of each badge in a single query
+            queryset=UserBadge.objects.annotate(
+                rank=Window(RowNumber(), partition_by=F('badge_id'), order_by=[F('issued_at').desc(), F('id').desc()]),
+            ).filter(rank__lte=preview_size).order_by('-issued_at', '-id'),
+        ))
+        .order_by('name')
+    )
 
     return render(request, 'badges.html', {
         'badges': badges,
-        'profiles': profiles,
-        'awarded': awarded,
+        'preview_size': preview_size,
         'message': message,
         'error': error,
     })
 
+
+@login_required
+@approved_required
+def badge_awards_view(request, badge_id: int):
+    """
+    Paginated, searchable list of the users awarded a badge.
+    Accepts the same POST actions as badges_view (grant_badge, revoke_badge).
+    """
+    badge = get_object_or_404(Badge, id=badge_id)
+    message = None
+    error = None
+
+    if request.method == 'POST':
+        message, error = handle_badge_action(request)
+
+    query = request.GET.get('q', '').strip()
+    awards = UserBadge.objects.filter(badge=badge).order_by('-issued_at', '-id')
+    if query:
+        awards = awards.filter(user__icontains=query)
+    paginator = Paginator(awards, getattr(settings, 'BADGE_AWARDS_PER_PAGE', 50))
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    return render(request, 'badge_awards.html', {
+        'badge': badge,
+        'page_obj': page_obj,
+        'query': query,
+        'message': message,
+        'error': error,
+    })
+
+
+@require_GET
+@login_required
+@approved_required
+def username_autocomplete(request):
+    """
+    GET /usernames/?q=<text>[&source=profile|enrollment|badge][&limit=20]
+    Returns known usernames starting with, then containing, the normalized text.
+    """
+    query = request.GET.get('q', '')
+    source = request.GET.get('source') or None
+    if source and source not in username_search.SOURCES:
+        return JsonResponse({'error': 'Source must be one of: ' + ', '.join(username_search.SOURCES)}, status=400)
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid limit'}, status=400)
+
+    return JsonResponse({'results': username_search.search(query, limit=limit, source=source)})
+
 @csrf_exempt
 @require_POST
 def receive_enrollment_data(request):
@@ -410,37 +752,55 @@ def receive_enrollment_data(request):
         return JsonResponse({'error': 'Token is required'}, status=400)
 
     try:
-        data = jwt.decode(token, PUBLIC_KEY, algorithms=['RS256'])
+        # signature (key chosen by kid, reloaded on rotation) and replay check
+        data = webhook_keys.decode(token)
         if not data:
             return JsonResponse({'error': 'Invalid token'}, status=401)
 
-        # Store the entire payload dynamically, updating only non-empty fields
-        user = data.get('user')
         try:
-            enrollment = Enrollment.objects.get(user=user)
-            # Only update fields in enrollment.data if the new value is not None, blank, or zero
-            updated_data = enrollment.data.copy() if enrollment.data else {}
-            for k, v in data.items():
-                if v not in [None, '', 0, 'null']:
-                    updated_data[k] = v
-            enrollment.data = updated_data
-            enrollment.save(update_fields=['data'])
-        except Enrollment.DoesNotExist:
-            enrollment = Enrollment.objects.create(user=user, data=data)
-
-        # Generate confirmation token
-        confirmation_id = str(uuid.uuid4())
-        confirmation_code = hashlib.sha256(
-            f"{enrollment.id}-{confirmation_id}".encode()
-        ).hexdigest()
-
-        # Store the confirmation code
-        enrollment.confirmation_code = confirmation_code
-        enrollment.save(update_fields=["confirmation_code"])
+            if ingest_queue.is_enabled():
+                # applied later, in batches, by process_enrollment_queue
+                confirmation_code = ingest_queue.enqueue(data)
+            else:
+                # Merge the payload into the stored data (non-empty fields only) and
+                # issue the confirmation code, in one locked transaction
+                _, confirmation_code = ingest.upsert(data)
+        except Exception:
+            # not stored, so a retry of the same token must not count as a replay
+            webhook_keys.release(data)
+            raise
 
         return JsonResponse({
             'message': 'Enrollment data received successfully',
             'confirmation': confirmation_code
         }, status=200)
+    except webhook_keys.ReplayedToken:
+        return JsonResponse({'error': 'Duplicate submission'}, status=409)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
+
+
+def cache_stats_view(request):
+    """
+    Admin page: GET /admin/cache-stats/
+    Configuration, size and probe latency of every cache backend, plus the
+    in-process caches and proxy request coalescing of this worker.
+    """
+    flights = single_flight.stats()
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Cache statistics',
+        'caches': cache_stats.collect(),
+        'in_process': [
+            ('Proxy reference lists', len(list_cache)),
+            ('Capacity labels', capacity_labels.memory_size()),
+        ],
+        'single_flight': [
+            ('Upstream calls made', flights['fetched']),
+            ('Joined a call in this worker', flights['joined']),
+            ("Used another worker's result", flights['shared']),
+            ('Gave up waiting', flights['timed_out']),
+            ('In flight now', flights['in_flight']),
+        ],
+    }
+    return render(request, 'admin/cache_stats.html', context)
@@ -0,0 +1,241 @@
+"""
+Verification of the JWTs posted to the enrollment webhook.
+
+Public keys come from the files listed in ``ENROLLMENT_WEBHOOK['KEY_FILES']``:
+PEM files (the key id is the file name without extension) and JWKS JSON
+files (ids from their ``kid`` members). Files are re-read when their mtime
+or size changes, checked at most every ``RELOAD_INTERVAL`` seconds, so keys
+can be rotated without a restart. A token naming a known ``kid`` is checked
+against that key only; tokens without one are tried against every key, and
+tokens naming an unknown one against the PEM keys, whose ids senders do not
+know.
+
+Verified tokens carrying ``nonce``/``timestamp`` claims are remembered for
+``REPLAY_TTL`` seconds in the default cache (shared by all workers) and in a
+per-process LRU of ``REPLAY_CACHE_SIZE`` entries; a second submission of the
+same claims is rejected before the signature is checked or the database is
+touched. The caller must ``release`` the claims when it could not store the
+submission, so the sender can retry the same token.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from django.conf import settings
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'KEY_FILES': [],
+    'ALGORITHMS': ['RS256'],
+    'RELOAD_INTERVAL': 5,
+    'REPLAY_TTL': 24 * 3600,
+    'REPLAY_CACHE_SIZE': 10000,
+}
+
+
+class ReplayedToken(jwt.InvalidTokenError):
+    pass
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'ENROLLMENT_WEBHOOK', {})}
+
+
+def _load_file(path):
+    """
+    ``({kid: public_key}, is_jwks)`` of one PEM or JWKS file.
+    """
+    with open(path, 'rb') as fh:
+        content = fh.read()
+    if content.lstrip().startswith(b'{'):
+        document = json.loads(content)
+        keys = document.get('keys', [document])
+        return {jwk.key_id: jwk.key for jwk in jwt.PyJWKSet(keys).keys}, True
+    kid = os.path.splitext(os.path.basename(path))[0]
+    return {kid: serialization.load_pem_public_key(content)}, False
+
+
+class KeyManager:
+    """
+    Public keys of the configured files, reloaded when the files change.
+    """
+    def __init__(self, paths, reload_interval=5):
+        self.paths = list(paths)
+        self.reload_interval = reload_interval
+        self._keys = {}
+        self._pem_kids = set()
+        self._signatures = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def _file_signatures(self):
+        signatures = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signatures.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signatures.append((path, None, None))
+        return signatures
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            signatures = self._file_signatures()
+            if signatures == self._signatures:
+                return
+            keys = {}
+            pem_kids = set()
+            for path, mtime, size in signatures:
+                if mtime is None:
+                    logger.warning("Webhook key file %s is missing", path)
+                    continue
+                try:
+                    loaded, is_jwks = _load_file(path)
+                except (OSError, ValueError, jwt.PyJWTError):
+                    logger.exception("Could not load webhook key file %s", path)
+                    continue
+                keys.update(loaded)
+                if not is_jwks:
+                    pem_kids.update(loaded)
+            self._keys = keys
+            self._pem_kids = pem_kids
+            self._signatures = signatures
+
+    def keys(self):
+        self.refresh()
+        return dict(self._keys)
+
+    def candidates(self, kid=None):
+        """
+        Keys to try for a token with header ``kid``: that key if it is known,
+        otherwise every PEM key (all keys when the token has no kid).
+        """
+        keys = self.keys()
+        if kid is None:
+            return list(keys.values())
+        if kid not in keys:
+            # maybe rotated in since the last check
+            self.refresh(force=True)
+            keys = self.keys()
+        if kid in keys:
+            return [keys[kid]]
+        # PEM key ids are file names, which senders signing with the
+        # original key never heard of
+        fallback = [key for name, key in keys.items() if name in self._pem_kids]
+        if not fallback:
+            raise jwt.InvalidKeyError(f'Unknown key id {kid}')
+        return fallback
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    """
+    Process-wide KeyManager, recreated when the configured files change.
+    """
+    global _manager
+    config = get_config()
+    with _manager_lock:
+        if _manager is None or _manager.paths != list(config['KEY_FILES']):
+            _manager = KeyManager(config['KEY_FILES'], config['RELOAD_INTERVAL'])
+        _manager.reload_interval = config['RELOAD_INTERVAL']
+        return _manager
+
+
+_recent = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def _seen_recently(key):
+    with _recent_lock:
+        expires = _recent.get(key)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _recent[key]
+            return False
+        return True
+
+
+def _remember(key, ttl, size):
+    with _recent_lock:
+        _recent[key] = time.monotonic() + ttl
+        _recent.move_to_end(key)
+        while len(_recent) > size:
+            _recent.popitem(last=False)
+
+
+def _forget(key):
+    with _recent_lock:
+        _recent.pop(key, None)
+
+
+def replay_key(claims):
+    """
+    Cache key of the nonce/timestamp claims, or None if the token has neither.
+    """
+    if claims.get('nonce') is None and claims.get('timestamp') is None:
+        return None
+    raw = json.dumps([claims.get('user'), claims.get('nonce'), claims.get('timestamp')], default=str)
+    return 'webhook-replay:' + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def decode(token):
+    """
+    Verified claims of ``token``. Raises jwt.InvalidTokenError (ReplayedToken
+    for a repeated submission) when it cannot be accepted.
+    """
+    config = get_config()
+    header = jwt.get_unverified_header(token)
+
+    # cheap check on the unverified claims; nothing is recorded until verified
+    key = replay_key(jwt.decode(token, options={'verify_signature': False}))
+    if key and (_seen_recently(key) or cache.get(key)):
+        raise ReplayedToken('Token was already submitted')
+
+    candidates = get_manager().candidates(header.get('kid'))
+    if not candidates:
+        raise jwt.InvalidKeyError('No webhook public key is configured')
+    error = None
+    for public_key in candidates:
+        try:
+            claims = jwt.decode(token, public_key, algorithms=config['ALGORITHMS'])
+            break
+        except jwt.InvalidSignatureError as e:
+            error = e
+    else:
+        raise error
+
+    if key:
+        # Of two concurrent submissions only one gets through where add() is
+        # atomic (locmem, db, redis); the file backend checks then sets, so
+        # near-simultaneous duplicates in different processes can both pass.
+        if not cache.add(key, True, config['REPLAY_TTL']):
+            raise ReplayedToken('Token was already submitted')
+        _remember(key, config['REPLAY_TTL'], config['REPLAY_CACHE_SIZE'])
+    return claims
+
+
+def release(claims):
+    """
+    Forget the replay key of ``claims``, whose submission was not stored.
+    """
+    key = replay_key(claims)
+    if key:
+        cache.delete(key)
+        _forget(key)
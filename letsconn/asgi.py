@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'letsconn.settings')
+# one long-lived event loop per process, so the async views can pool their upstream connections
+os.environ.setdefault('OUTBOUND_ASYNC_BACKEND', 'httpx')
+# no persistent database connections (settings_env.configure_database_tuning
+# defaults CONN_MAX_AGE to 60 for WSGI): sync code runs on executor threads whose
+# connections are not closed at the end of a request, so under ASGI they would
+# pile up until the server's limit
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
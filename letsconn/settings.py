@@ -15,7 +15,7 @@ import os, mimetypes
 from .settings_env import (
     BASE_DIR, HOME, SECRET_KEY, SOCIAL_AUTH_MEDIAWIKI_URL, SOCIAL_AUTH_MEDIAWIKI_KEY, 
     SOCIAL_AUTH_MEDIAWIKI_SECRET, DEBUG, ALLOWED_HOSTS, SOCIAL_AUTH_MEDIAWIKI_CALLBACK, DATABASES,
-    EMAIL_HOST, EMAIL_PORT, SERVER_EMAIL, ADMINS
+    SQLITE_PRAGMAS, CACHES, EMAIL_HOST, EMAIL_PORT, SERVER_EMAIL, ADMINS, env_flag
 )
 
 
@@ -39,7 +39,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'credentials.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'social_django.middleware.SocialAuthExceptionMiddleware',
@@ -135,3 +135,93 @@ mimetypes.add_type("text/javascript", ".js", True)
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Outbound HTTP client used for capx-backend and metabase (see enrollments/http_client.py)
+
+OUTBOUND_HTTP = {
+    'CONNECT_TIMEOUT': float(os.environ.get('OUTBOUND_CONNECT_TIMEOUT', 3.05)),
+    'READ_TIMEOUT': float(os.environ.get('OUTBOUND_READ_TIMEOUT', 15)),
+    'MAX_RETRIES': int(os.environ.get('OUTBOUND_MAX_RETRIES', 2)),
+    'BREAKER_THRESHOLD': int(os.environ.get('OUTBOUND_BREAKER_THRESHOLD', 5)),
+    'BREAKER_COOLDOWN': float(os.environ.get('OUTBOUND_BREAKER_COOLDOWN', 30)),
+    # async views: 'httpx' (needs the httpx package; letsconn/asgi.py turns it on) or 'threads'
+    'ASYNC_BACKEND': os.environ.get('OUTBOUND_ASYNC_BACKEND', 'threads'),
+    'MAX_CONCURRENCY': int(os.environ.get('OUTBOUND_MAX_CONCURRENCY', 100)),
+}
+PROXY_BATCH_MAX_WORKERS = int(os.environ.get('PROXY_BATCH_MAX_WORKERS', 8))
+# larger /proxy/users/ batches are rejected with 400, never truncated
+PROXY_BATCH_MAX_USERS = int(os.environ.get('PROXY_BATCH_MAX_USERS', 10000))
+
+# Cache for the /proxy/?item=<list> reference lists (see enrollments/list_cache.py)
+
+PROXY_LIST_CACHE = {
+    'TTL': int(os.environ.get('PROXY_LIST_CACHE_TTL', 3600)),
+    'STALE_WHILE_REVALIDATE': int(os.environ.get('PROXY_LIST_CACHE_SWR', 86400)),
+}
+
+# Capacity QID -> label store (see enrollments/capacity_labels.py)
+
+CAPACITY_LABELS = {
+    'TTL': int(os.environ.get('CAPACITY_LABELS_TTL', 7 * 24 * 3600)),
+}
+
+# Enrollments JSON API and exports (see enrollments/listing.py and enrollments/exports.py)
+
+ENROLLMENTS_API_MAX_LIMIT = int(os.environ.get('ENROLLMENTS_API_MAX_LIMIT', 500))
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Badge management pages and username autocomplete
+
+BADGE_AWARDS_PREVIEW = 10
+BADGE_AWARDS_PER_PAGE = 50
+USERNAME_AUTOCOMPLETE_CACHE_TTL = int(os.environ.get('USERNAME_AUTOCOMPLETE_CACHE_TTL', 60))
+
+# Public badge and profile APIs (see enrollments/badge_cache.py)
+
+USER_BADGES_CACHE_TTL = int(os.environ.get('USER_BADGES_CACHE_TTL', 3600))
+USER_BADGES_MAX_AGE = int(os.environ.get('USER_BADGES_MAX_AGE', 60))
+PUBLIC_API_BATCH_MAX_USERS = int(os.environ.get('PUBLIC_API_BATCH_MAX_USERS', 100))
+BADGE_CERTIFICATE_CACHE_TTL = int(os.environ.get('BADGE_CERTIFICATE_CACHE_TTL', 86400))
+BADGE_CERTIFICATE_MISSING_TTL = int(os.environ.get('BADGE_CERTIFICATE_MISSING_TTL', 300))
+BADGE_CERTIFICATE_MAX_AGE = int(os.environ.get('BADGE_CERTIFICATE_MAX_AGE', 3600))
+
+# Sessions and the cached request.user (see credentials/middleware.py).
+# SESSION_ENGINE may also be 'django.contrib.sessions.backends.signed_cookies'
+# to keep sessions out of the database entirely.
+
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 300))
+
+# Enrollment webhook token verification (see enrollments/webhook_keys.py).
+# WEBHOOK_KEY_FILES is a comma-separated list of PEM or JWKS files, replacing
+# $HOME/public_key.pem; the files are re-read when they change.
+
+ENROLLMENT_WEBHOOK = {
+    'KEY_FILES': [
+        path.strip() for path in os.environ.get(
+            'WEBHOOK_KEY_FILES', os.path.join(HOME, 'public_key.pem')
+        ).split(',') if path.strip()
+    ],
+    'RELOAD_INTERVAL': int(os.environ.get('WEBHOOK_KEY_RELOAD_INTERVAL', 5)),
+    'REPLAY_TTL': int(os.environ.get('WEBHOOK_REPLAY_TTL', 24 * 3600)),
+    'REPLAY_CACHE_SIZE': int(os.environ.get('WEBHOOK_REPLAY_CACHE_SIZE', 10000)),
+}
+
+# Queued ingestion (see enrollments/ingest_queue.py). With QUEUED on, the
+# webhook only stores verified submissions and `manage.py process_enrollment_queue`
+# must be running to apply them.
+
+ENROLLMENT_INGEST = {
+    'QUEUED': env_flag('ENROLLMENT_INGEST_QUEUED'),
+    'BATCH_SIZE': int(os.environ.get('ENROLLMENT_INGEST_BATCH_SIZE', 200)),
+    'POLL_INTERVAL': float(os.environ.get('ENROLLMENT_INGEST_POLL_INTERVAL', 1)),
+}
+
+# Coalescing of identical concurrent /proxy/ upstream calls (see enrollments/single_flight.py)
+
+PROXY_SINGLE_FLIGHT = {
+    'ENABLED': env_flag('PROXY_SINGLE_FLIGHT', True),
+    'RESULT_TTL': int(os.environ.get('PROXY_SINGLE_FLIGHT_RESULT_TTL', 2)),
+    'WAIT_TIMEOUT': float(os.environ.get('PROXY_SINGLE_FLIGHT_WAIT_TIMEOUT', 30)),
+}
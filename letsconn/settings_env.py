@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -11,8 +12,93 @@ SOCIAL_AUTH_MEDIAWIKI_URL = 'https://meta.wikimedia.org/w/index.php'
 SOCIAL_AUTH_MEDIAWIKI_KEY = os.environ.get("SOCIAL_AUTH_MEDIAWIKI_KEY")
 SOCIAL_AUTH_MEDIAWIKI_SECRET = os.environ.get("SOCIAL_AUTH_MEDIAWIKI_SECRET")
 
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',  # needs the redis package
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+def env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def configure_caches(production):
+    """
+    CACHES for the backend named by CACHE_BACKEND (a key of CACHE_BACKENDS).
+    Defaults to locmem locally; in production to redis when REDIS_URL is set and
+    to the file cache otherwise, since the webservice runs several processes.
+    The db backend needs `python manage.py createcachetable` once.
+    """
+    backend = os.environ.get('CACHE_BACKEND')
+    if not backend:
+        if not production:
+            backend = 'locmem'
+        else:
+            backend = 'redis' if os.environ.get('REDIS_URL') else 'file'
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"CACHE_BACKEND must be one of {', '.join(CACHE_BACKENDS)}, not {backend!r}")
+
+    locations = {
+        'locmem': 'letsconn',
+        'file': os.path.join(HOME or str(BASE_DIR), '.cache', 'letsconn'),
+        'db': 'letsconn_cache',
+        'redis': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+        'dummy': '',
+    }
+    cache = {
+        'BACKEND': CACHE_BACKENDS[backend],
+        'LOCATION': os.environ.get('CACHE_LOCATION') or locations[backend],
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
+        # the Toolforge Redis is shared by every tool, so keys need a prefix of our own
+        'KEY_PREFIX': os.environ.get('CACHE_KEY_PREFIX') or os.environ.get('TOOLNAME') or 'letsconn',
+    }
+    if backend in ('locmem', 'file', 'db'):
+        cache['OPTIONS'] = {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000))}
+    return {'default': cache}
+
+def configure_database_tuning(production):
+    """
+    Connection options for the default database, on unless DB_TUNING=0 (handy
+    for before/after runs of `manage.py benchmark_requests`). Returns the keys
+    to merge into DATABASES['default'] and the SQLite pragmas that
+    enrollments.signals applies to every new connection.
+    """
+    tuning = env_flag('DB_TUNING', True)
+    options = {
+        # keep connections across requests, checking them before reuse; under
+        # ASGI letsconn/asgi.py sets DB_CONN_MAX_AGE=0, because the sync code
+        # runs on executor threads whose connections are never closed at the
+        # end of a request, so persistent ones would pile up
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60 if tuning else 0)),
+        'CONN_HEALTH_CHECKS': env_flag('DB_CONN_HEALTH_CHECKS', tuning),
+    }
+    pragmas = {}
+    if production and tuning:
+        options['OPTIONS'] = {
+            # adds strict mode to the server's sql_mode instead of replacing it
+            'init_command': (
+                "SET sql_mode=CONCAT_WS(',', NULLIF(@@sql_mode, ''), 'STRICT_TRANS_TABLES'), "
+                "innodb_lock_wait_timeout=10"
+            ),
+            'isolation_level': os.environ.get('DB_ISOLATION_LEVEL', 'read committed'),
+        }
+    elif tuning:
+        pragmas = {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'mmap_size': 256 * 1024 * 1024,
+            'busy_timeout': 5000,
+        }
+    return options, pragmas
+
 def configure_settings():
-    if os.path.exists(HOME + '/replica.my.cnf'):
+    production = os.path.exists(HOME + '/replica.my.cnf')
+    database_tuning, sqlite_pragmas = configure_database_tuning(production)
+    if production:
         debug = False
         hosts = [ os.environ.get("TOOLNAME") + '.toolforge.org', 'toolforge.org' ]
         callback = 'https://' + os.environ.get("TOOLNAME") + '.toolforge.org/oauth/complete/mediawiki/'
@@ -30,6 +116,7 @@ def configure_settings():
                 'PASSWORD': os.environ.get("TOOL_TOOLSDB_PASSWORD"),
                 'HOST': 'tools.db.svc.wikimedia.cloud',
                 'PORT': '',
+                **database_tuning,
             },
         }
 
@@ -47,6 +134,7 @@ def configure_settings():
             'default': {
                 'ENGINE': 'django.db.backends.sqlite3',
                 'NAME':  BASE_DIR / 'db.sqlite3',
+                **database_tuning,
             }
         }
 
@@ -55,6 +143,8 @@ def configure_settings():
         'ALLOWED_HOSTS': hosts,
         'SOCIAL_AUTH_MEDIAWIKI_CALLBACK': callback,
         'DATABASES': databases,
+        'SQLITE_PRAGMAS': sqlite_pragmas,
+        'CACHES': configure_caches(production=not debug),
         'MESSAGE': message,
         'EMAIL_HOST': email_host,
         'EMAIL_PORT': email_port,
@@ -67,8 +157,11 @@ DEBUG = settings['DEBUG']
 ALLOWED_HOSTS = settings['ALLOWED_HOSTS']
 SOCIAL_AUTH_MEDIAWIKI_CALLBACK = settings['SOCIAL_AUTH_MEDIAWIKI_CALLBACK']
 DATABASES = settings['DATABASES']
+SQLITE_PRAGMAS = settings['SQLITE_PRAGMAS']
+CACHES = settings['CACHES']
 EMAIL_HOST = settings['EMAIL_HOST']
 EMAIL_PORT = settings['EMAIL_PORT']
 SERVER_EMAIL = settings['SERVER_EMAIL']
 ADMINS = settings['ADMINS']
-print(settings['MESSAGE'])
\ No newline at end of file
+# stderr, so commands that write data to stdout (export_enrollments) stay clean
+print(settings['MESSAGE'], file=sys.stderr)
\ No newline at end of file
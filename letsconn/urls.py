@@ -20,7 +20,10 @@ from django.conf import settings
 from django.conf.urls import include
 from django.conf.urls.static import static
 
+from enrollments.views import cache_stats_view
+
 urlpatterns = [
+    path('admin/cache-stats/', admin.site.admin_view(cache_stats_view), name='cache_stats'),
     path('admin/', admin.site.urls),
     path('', include('enrollments.urls')),
     path('', include('credentials.urls')),